@@ -2,4 +2,8 @@
 
 from . import controllers
 from . import models
-from . import wizard
\ No newline at end of file
+from . import wizard
+
+
+def post_init_hook(env):
+    env['stock.availability.ledger']._rebuild()
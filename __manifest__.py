@@ -13,10 +13,10 @@ Long description of module's purpose
 
    
     'category': 'Inventory/Inventory',
-    'version': '17.0.1.0.0',
+    'version': '17.0.1.1.0',
 
     # any module necessary for this one to work correctly
-    'depends': ['base','stock', 'fieldservice'],
+    'depends': ['base','stock', 'fieldservice', 'point_of_sale'],
 
     # always loaded
     'data': [
@@ -26,12 +26,19 @@ Long description of module's purpose
         
         # Data
         # 'data/problem_data.xml',
+        'data/ir_cron_data.xml',
         #wizard
         # 'wizard/inventory_transfer_wizard.xml',
         
         #Views
         'views/inventory_transfer_views.xml',
         'views/stock_picking_view.xml',
+        'views/stock_availability_ledger_views.xml',
+        'views/stock_picking_bulk_validation_views.xml',
+        'views/stock_validation_profile_views.xml',
+        'views/product_template_tracking_snapshot_views.xml',
+        'views/stock_move_event_views.xml',
+        'views/stock_shortfall_report_views.xml',
         
         
     ],
@@ -43,12 +50,14 @@ Long description of module's purpose
         #     'new_modules_customization/static/src/css/customer_display.css',
         # ]
         'point_of_sale.assets': [
+            'new_modules_customization/static/src/js/subscriber_store.js',
             'new_modules_customization/static/src/js/pos_customer_display.js',
             'new_modules_customization/static/src/xml/pos_customer_display.xml',
             'new_modules_customization/static/src/css/pos_customer_display.css',
         ],
     },
      
+    'post_init_hook': 'post_init_hook',
     'installable': True,
     'auto_install': False,
     
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+from ..models.snapshot import snapshot_env
+import hashlib
+import json
+
+# Largest number of (product, location) pairs accepted in one request
+MAX_AVAILABILITY_PAIRS = 50000
+
+
+class StockAvailabilityController(http.Controller):
+
+    @http.route('/new_modules_customization/availability', type='http', auth='user',
+                methods=['POST'], csrf=False)
+    def availability(self, **kwargs):
+        """Return the availability of a batch of (product, location) pairs
+
+        Expects a JSON body ``{"pairs": [[product_id, location_id], ...]}``
+        and answers with arrays aligned with the requested pairs::
+
+            {"available": [...], "reserved": [...], "pending_out": [...]}
+
+        Every location must be visible to the user under the record rules
+        of ``stock.location``. The response carries an ETag derived from the
+        requested pairs and the availability version; polls sending it back
+        in If-None-Match get an empty 304 answer while nothing changed.
+        """
+        request.env['stock.quant'].check_access_rights('read')
+        body = request.httprequest.get_data()
+        try:
+            pairs = [(int(product_id), int(location_id)) for product_id, location_id in json.loads(body or '{}')['pairs']]
+        except (ValueError, TypeError, KeyError):
+            return request.make_json_response({'error': 'Expected {"pairs": [[product_id, location_id], ...]}'}, status=400)
+        if len(pairs) > MAX_AVAILABILITY_PAIRS:
+            return request.make_json_response(
+                {'error': f'At most {MAX_AVAILABILITY_PAIRS} pairs can be requested at once'}, status=400)
+
+        location_ids = {location_id for _product_id, location_id in pairs}
+        visible_location_ids = request.env['stock.location'].with_context(active_test=False).search([
+            ('id', 'in', list(location_ids)),
+        ]).ids
+        if location_ids.difference(visible_location_ids):
+            return request.make_json_response(
+                {'error': 'Some of the requested locations do not exist or are not accessible'}, status=403)
+
+        # The version is read by the first statement of a fresh snapshot: any
+        # change missing from the totals read in it bumps the version later.
+        with snapshot_env(request.env, replica=False) as env:
+            etag = self._get_availability_etag(body, env['stock.move']._get_availability_version())
+            headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+            if request.httprequest.if_none_match.contains(etag):
+                return request.make_response('', headers=headers, status=304)
+            totals = env['stock.move']._read_availability(pairs)
+        return request.make_json_response({
+            'available': [totals[pair]['quantity'] for pair in pairs],
+            'reserved': [totals[pair]['reserved_quantity'] for pair in pairs],
+            'pending_out': [totals[pair]['pending_out_qty'] for pair in pairs],
+        }, headers=headers)
+
+    def _get_availability_etag(self, body, version):
+        """Hash the request with the availability version"""
+        digest = hashlib.sha1(body)
+        digest.update(str(version).encode())
+        return digest.hexdigest()
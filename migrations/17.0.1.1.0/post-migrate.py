@@ -0,0 +1,7 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # The ledger is filled by the post_init_hook on install only
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['stock.availability.ledger']._rebuild()
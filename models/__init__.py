@@ -1,6 +1,18 @@
 # -*- coding: utf-8 -*-
 
+from . import stock_availability_ledger
 from . import stock_move
+from . import stock_move_event
+from . import stock_location
 from . import stock_picking
+from . import stock_picking_bulk_validation
+from . import stock_picking_type
+from . import stock_quant
+from . import stock_shortfall_report
+from . import stock_validation_profile
 from . import product_template
+from . import product_template_tracking_snapshot
+from . import mail_tracking_value
+from . import pos_config
 from . import pos_session
+from . import res_partner
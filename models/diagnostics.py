@@ -0,0 +1,58 @@
+import logging
+import random
+
+
+class DiagnosticsChannel:
+    """Verbose tracing channel for the transfer validation hot path
+
+    Tracing is off unless the channel logger is enabled at DEBUG level, e.g.
+    with ``--log-handler=odoo.addons.new_modules_customization.diagnostics:DEBUG``.
+    When off, ``active()`` costs one level check and never touches the ORM.
+    When on, traces are limited to:
+
+    - requests run with the ``diagnostics_trace`` context key,
+    - the users and transfers listed (comma-separated ids) in the
+      ``new_modules_customization.trace_user_ids`` and
+      ``new_modules_customization.trace_picking_ids`` system parameters,
+    - a random sample of the other calls, given by the
+      ``new_modules_customization.trace_sample_rate`` system parameter
+      (between 0 and 1, defaults to 1).
+
+    Messages use lazy %-formatting and must only be given ids and numbers,
+    never relational values that would trigger reads.
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    def active(self, env, picking_ids=()):
+        """Return whether the current call should be traced
+
+        :param picking_ids: ids of the transfers concerned by the call, or a
+            callable returning them, only evaluated when tracing is on
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        if env.context.get('diagnostics_trace'):
+            return True
+        get_param = env['ir.config_parameter'].sudo().get_param
+        if env.uid in self._parse_ids(get_param('new_modules_customization.trace_user_ids')):
+            return True
+        traced_picking_ids = self._parse_ids(get_param('new_modules_customization.trace_picking_ids'))
+        if traced_picking_ids:
+            if callable(picking_ids):
+                picking_ids = picking_ids()
+            if traced_picking_ids.intersection(picking_ids):
+                return True
+        sample_rate = float(get_param('new_modules_customization.trace_sample_rate', 1.0))
+        return random.random() < sample_rate
+
+    def trace(self, msg, *args):
+        self.logger.debug(msg, *args)
+
+    @staticmethod
+    def _parse_ids(value):
+        return {int(id_) for id_ in (value or '').split(',') if id_.strip().isdigit()}
+
+
+diagnostics = DiagnosticsChannel('odoo.addons.new_modules_customization.diagnostics')
@@ -0,0 +1,193 @@
+from odoo import api, models
+from collections import defaultdict
+import difflib
+import json
+
+# Prefix of old_value_text holding a reverse delta instead of a full value
+DELTA_PREFIX = '@@delta:'
+
+# Text values shorter than this are always stored in full
+DELTA_MIN_LENGTH = 256
+
+# Longest run of changes whose new value is rebuilt from the next change
+# rather than stored: every CHECKPOINT_INTERVAL changes of a field, one new
+# value is kept in full
+CHECKPOINT_INTERVAL = 20
+
+
+def make_text_delta(source, target):
+    """Encode ``target`` as a delta against ``source``
+
+    The delta is a list of ``[start, end]`` ranges copied from ``source`` and
+    literal strings inserted between them.
+    """
+    ops = []
+    matcher = difflib.SequenceMatcher(None, source, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(target[j1:j2])
+    return json.dumps(ops, separators=(',', ':'))
+
+
+def apply_text_delta(source, delta):
+    """Rebuild the value encoded by ``make_text_delta`` from ``source``"""
+    return ''.join(
+        source[op[0]:op[1]] if isinstance(op, list) else op
+        for op in json.loads(delta)
+    )
+
+
+class MailTrackingValue(models.Model):
+    _inherit = 'mail.tracking.value'
+
+    @api.model
+    def _compact_tracking_commands(self, model_name, commands_by_res_id, text_field_ids):
+        """Replace long text values of tracking creation commands by deltas
+
+        The old value is stored as a reverse delta against the new one, which
+        is kept in full: the latest change of each field anchors the deltas
+        of the older ones. The new value of the previous change of the field
+        is then dropped when it is the old value of the new change, unless it
+        is a checkpoint (see ``CHECKPOINT_INTERVAL``). Values are rebuilt by
+        ``_get_compact_values()`` when read.
+
+        Must only be called for commands that are going to be created.
+
+        :param commands_by_res_id: dict {record id: tracking value creation
+            commands}
+        """
+        old_values = {}
+        for res_id, tracking_value_ids in commands_by_res_id.items():
+            for command in tracking_value_ids:
+                vals = command[2]
+                if vals.get('field_id') not in text_field_ids:
+                    continue
+                old_value = vals.get('old_value_text') or ''
+                new_value = vals.get('new_value_text') or ''
+                old_values[res_id, vals['field_id']] = old_value
+                if max(len(old_value), len(new_value)) < DELTA_MIN_LENGTH:
+                    continue
+                delta = make_text_delta(new_value, old_value)
+                if len(delta) + len(DELTA_PREFIX) >= len(old_value):
+                    continue
+                vals['old_value_text'] = DELTA_PREFIX + delta
+        if old_values:
+            self._release_previous_values(model_name, old_values)
+        return commands_by_res_id
+
+    @api.model
+    def _release_previous_values(self, model_name, old_values):
+        """Drop the stored new value of the latest compact change of each
+        field when it equals the old value of the change being created
+
+        :param old_values: dict {(record id, field id): full old value of
+            the new change}
+        """
+        self.flush_model(['mail_message_id', 'field_id', 'old_value_text', 'new_value_text'])
+        self.env['mail.message'].flush_model(['model', 'res_id'])
+        # Latest changes of each field, enough to measure the run of
+        # changes depending on the latest one
+        self.env.cr.execute("""
+            SELECT id, res_id, field_id, compact, new_value_text
+              FROM (SELECT tracking.id, message.res_id, tracking.field_id, tracking.new_value_text,
+                           tracking.old_value_text LIKE %(prefix)s AS compact,
+                           row_number() OVER (PARTITION BY message.res_id, tracking.field_id
+                                              ORDER BY tracking.id DESC) AS rank
+                      FROM mail_tracking_value AS tracking
+                      JOIN mail_message AS message ON message.id = tracking.mail_message_id
+                     WHERE message.model = %(model)s
+                       AND message.res_id = ANY(%(res_ids)s)
+                       AND tracking.field_id = ANY(%(field_ids)s)) AS latest
+             WHERE rank <= %(limit)s
+             ORDER BY res_id, field_id, id DESC
+        """, {
+            'prefix': DELTA_PREFIX + '%',
+            'model': model_name,
+            'res_ids': list({res_id for res_id, _field_id in old_values}),
+            'field_ids': list({field_id for _res_id, field_id in old_values}),
+            'limit': CHECKPOINT_INTERVAL,
+        })
+        chains = defaultdict(list)
+        for tracking_id, res_id, field_id, compact, new_value in self.env.cr.fetchall():
+            if (res_id, field_id) in old_values:
+                chains[res_id, field_id].append((tracking_id, compact, new_value))
+
+        release_ids = []
+        for key, chain in chains.items():
+            tracking_id, compact, new_value = chain[0]
+            if not compact or not new_value or new_value != old_values[key]:
+                continue
+            # Changes right before it whose new value is rebuilt from it
+            run = 0
+            for _tracking_id, previous_compact, previous_new_value in chain[1:]:
+                if not previous_compact or previous_new_value:
+                    break
+                run += 1
+            if run + 1 < CHECKPOINT_INTERVAL:
+                release_ids.append(tracking_id)
+        if release_ids:
+            self.env.cr.execute("UPDATE mail_tracking_value SET new_value_text = NULL WHERE id = ANY(%s)",
+                                [release_ids])
+            self.browse(release_ids).invalidate_recordset(['new_value_text'])
+
+    def _is_compact(self):
+        self.ensure_one()
+        return bool(self.old_value_text and self.old_value_text.startswith(DELTA_PREFIX))
+
+    def _has_stored_new_value(self):
+        """Whether the new value is stored, rather than being the old value
+        of the next change of the field"""
+        self.ensure_one()
+        return not self._is_compact() or bool(self.new_value_text)
+
+    def _get_compact_values(self):
+        """Rebuild the full values of compact tracking values
+
+        Walks the changes of each tracked field back from the first stored
+        new value following the latest requested change. Without such an
+        anchor, e.g. once its message was deleted, the tracking values are
+        left as they are: the current value of the record may not follow
+        from the tracked changes.
+
+        :return: dict {tracking value id: (old value, new value)}
+        """
+        chains = defaultdict(lambda: self.browse())
+        for tracking in self.filtered(lambda t: t._is_compact() and t.field_id):
+            message = tracking.mail_message_id
+            chains[message.model, message.res_id, tracking.field_id] |= tracking
+
+        result = {}
+        for (model, res_id, field), trackings in chains.items():
+            history = self.sudo().search([
+                ('field_id', '=', field.id),
+                ('mail_message_id.model', '=', model),
+                ('mail_message_id.res_id', '=', res_id),
+                ('id', '>=', min(trackings.ids)),
+            ], order='id')
+            anchor_index = next((
+                index for index, tracking in enumerate(history)
+                if tracking.id >= max(trackings.ids) and tracking._has_stored_new_value()
+            ), None)
+            if anchor_index is None:
+                continue
+            value = None
+            for tracking in history[:anchor_index + 1].sorted('id', reverse=True):
+                new_value = (tracking.new_value_text or '') if tracking._has_stored_new_value() else value
+                if tracking._is_compact():
+                    value = apply_text_delta(new_value, tracking.old_value_text[len(DELTA_PREFIX):])
+                else:
+                    value = tracking.old_value_text or ''
+                if tracking in trackings:
+                    result[tracking.id] = (value, new_value)
+        return result
+
+    def _tracking_value_format(self):
+        formatted = super()._tracking_value_format()
+        compact_values = self._get_compact_values()
+        if compact_values:
+            for values in formatted:
+                if values['id'] in compact_values:
+                    values['oldValue']['value'], values['newValue']['value'] = compact_values[values['id']]
+        return formatted
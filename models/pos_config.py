@@ -1,6 +1,20 @@
 
-from odoo import models
+from odoo import fields, models
+import uuid
 
 class PosConfig(models.Model):
     _inherit = 'pos.config'
-    
\ No newline at end of file
+
+    subscriber_channel_token = fields.Char(string='Subscriber Channel Token', copy=False, readonly=True,
+                                           groups='point_of_sale.group_pos_manager')
+
+    def _get_subscriber_channel(self):
+        """Return the bus channel of the subscriber updates of the shop
+
+        The channel name holds a random token so that only the POS sessions
+        of the shop can listen to it.
+        """
+        self.ensure_one()
+        if not self.sudo().subscriber_channel_token:
+            self.sudo().subscriber_channel_token = str(uuid.uuid4())
+        return f'new_modules_customization.subscribers.{self.sudo().subscriber_channel_token}'
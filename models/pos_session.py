@@ -1,26 +1,182 @@
-# from odoo import models
-
-# class PosSession(models.Model):
-#     _inherit = 'pos.session'
-
-#     def _get_pos_ui_res_partner(self, params):
-#         # Get the default partner fields first
-#         result = super()._get_pos_ui_res_partner(params)
-        
-#         # Add our custom fields to the existing fields list
-#         additional_fields = [
-#             'family_number',             # Family number (الرقم العائلي)
-#             'total_due',                 # Prepaid balance (الرصيد المستحق)
-#             'number_of_expired_days',    # Remaining days (الأيام المتبقية)
-#             'status',                    # Status (حالة الاشتراك)
-#             'category_id',               # Category tags (نوع الاشتراك)
-#             'menu_type_ids',             # Customer group (مجموعة العملاء)
-#             'area_name_id',              # Region name (اسم المنطقة)
-#             'area_number_id',            # Area number (رقم المنطقة)
-#         ]
-        
-#         # Extend the fields in the result
-#         if 'fields' in result:
-#             result['fields'].extend(additional_fields)
-        
-#         return result
\ No newline at end of file
+from odoo import api, models
+from odoo.osv import expression
+from datetime import timedelta
+
+# Subscription fields shown on the POS payment screen
+SUBSCRIBER_FIELDS = [
+    'family_number',             # Family number (الرقم العائلي)
+    'total_due',                 # Prepaid balance (الرصيد المستحق)
+    'number_of_expired_days',    # Remaining days (الأيام المتبقية)
+    'status',                    # Status (حالة الاشتراك)
+    'category_id',               # Category tags (نوع الاشتراك)
+    'area_name_id',              # Region name (اسم المنطقة)
+]
+
+# Subscription fields pushed to open POS sessions when they change
+SUBSCRIBER_PUSH_FIELDS = ['number_of_expired_days', 'total_due', 'status']
+
+# Number of partners sent per subscriber synchronisation call
+SUBSCRIBER_SYNC_LIMIT = 2000
+
+# A partner's write_date is the start of the transaction writing it, which
+# may commit after a later synchronisation: completed synchronisations
+# resume this long before their own start
+SUBSCRIBER_SYNC_MARGIN = timedelta(minutes=15)
+
+# Parameter storing the sync token of the last subscriber push
+SUBSCRIBER_PUSH_TOKEN_PARAM = 'new_modules_customization.subscriber_push_token'
+
+
+class PosSession(models.Model):
+    _inherit = 'pos.session'
+
+    def _get_subscriber_fields(self):
+        """Return the subscription fields existing on partners"""
+        partner_fields = self.env['res.partner']._fields
+        return [fname for fname in SUBSCRIBER_FIELDS if fname in partner_fields]
+
+    def _loader_params_res_partner(self):
+        result = super()._loader_params_res_partner()
+        # Deliver the subscription fields with the partners loaded in the session
+        loaded_fields = result['search_params']['fields']
+        loaded_fields.extend(fname for fname in self._get_subscriber_fields() if fname not in loaded_fields)
+        return result
+
+    def _get_pos_ui_res_partner(self, params):
+        partners = super()._get_pos_ui_res_partner(params)
+        self._add_subscriber_category_names(partners)
+        return partners
+
+    def get_pos_ui_res_partner_by_params(self, custom_search_params):
+        partners = super().get_pos_ui_res_partner_by_params(custom_search_params)
+        self._add_subscriber_category_names(partners)
+        return partners
+
+    def get_subscriber_info(self, partner_ids):
+        """Read the subscription data of partners loaded without it"""
+        partners = self.env['res.partner'].search_read(
+            [('id', 'in', partner_ids)],
+            ['name', 'phone', 'mobile'] + self._get_subscriber_fields(),
+        )
+        self._add_subscriber_category_names(partners)
+        return partners
+
+    def _get_subscriber_domain(self):
+        """Domain of the partners kept in the POS subscriber cache"""
+        if 'family_number' in self.env['res.partner']._fields:
+            return [('family_number', '!=', False)]
+        return []
+
+    def get_subscriber_changes(self, sync_token=False, limit=SUBSCRIBER_SYNC_LIMIT):
+        """Return the subscribers changed since ``sync_token``
+
+        Partners are scanned by increasing (write_date, id), ``limit`` at a
+        time; between pages the returned token keeps the full precision of
+        the last scanned write_date, so partners sharing one write date are
+        never returned twice. Once done, the token goes back
+        ``SUBSCRIBER_SYNC_MARGIN`` before the current transaction, so that
+        partners committed later by transactions already running are
+        returned by the next synchronisation; the client replaces the
+        partners it receives again by id. Archived partners are included
+        with ``active`` set to false so that the client drops them.
+
+        :param sync_token: token returned by the previous call, or False for
+            a full load
+        :return: dict with the ``partners``, the next ``sync_token`` and
+            ``done`` when no more changes are pending
+        """
+        last_date, last_id = sync_token.split('|') if sync_token else ('-infinity', 0)
+        Partner = self.env['res.partner'].with_context(active_test=False)
+        Partner.flush_model(['write_date'])
+        # Keyset scan on the (write_date, id) index; the subscriber domain is
+        # applied afterwards so that the token always moves forward
+        self.env.cr.execute("""
+            SELECT id, write_date
+              FROM res_partner
+             WHERE (write_date, id) > (%s::timestamp, %s)
+             ORDER BY write_date, id
+             LIMIT %s
+        """, [last_date, int(last_id), limit])
+        rows = self.env.cr.fetchall()
+        partners = Partner.search_read(
+            expression.AND([self._get_subscriber_domain(), [('id', 'in', [row[0] for row in rows])]]),
+            ['name', 'phone', 'mobile', 'active'] + self._get_subscriber_fields(),
+            order='write_date, id',
+        )
+        self._add_subscriber_category_names(partners)
+        done = len(rows) < limit
+        if done:
+            sync_token = f"{(self.env.cr.now() - SUBSCRIBER_SYNC_MARGIN).isoformat()}|0"
+        else:
+            last_id, last_date = rows[-1]
+            sync_token = f"{last_date.isoformat()}|{last_id}"
+        return {
+            'partners': partners,
+            'sync_token': sync_token,
+            'done': done,
+        }
+
+    def _pos_data_process(self, loaded_data):
+        super()._pos_data_process(loaded_data)
+        loaded_data['subscriber_channel'] = self.config_id._get_subscriber_channel()
+
+    @api.model
+    def _get_subscriber_push_token(self):
+        self.env.cr.execute("SELECT value FROM ir_config_parameter WHERE key = %s",
+                            [SUBSCRIBER_PUSH_TOKEN_PARAM])
+        row = self.env.cr.fetchone()
+        return row and row[0]
+
+    @api.model
+    def _set_subscriber_push_token(self, sync_token):
+        """Store the push token in SQL: ``set_param`` would clear the
+        ormcaches of every worker at each run"""
+        self.env.cr.execute("""
+            INSERT INTO ir_config_parameter (key, value)
+            VALUES (%s, %s)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+        """, [SUBSCRIBER_PUSH_TOKEN_PARAM, sync_token])
+
+    @api.model
+    def _cron_publish_subscriber_updates(self):
+        """Publish the subscription changes of the last interval to the open
+        POS sessions, in one bus message per shop
+
+        Changes are collected with :meth:`get_subscriber_changes` since the
+        last run, so the cron interval is the debounce delay; partners
+        changed within the synchronisation margin are published again.
+        """
+        sync_token = self._get_subscriber_push_token()
+        if not sync_token:
+            # Start from now, open sessions already loaded the current data
+            self._set_subscriber_push_token(f"{(self.env.cr.now() - SUBSCRIBER_SYNC_MARGIN).isoformat()}|0")
+            return
+
+        partners = []
+        done = False
+        while not done:
+            changes = self.sudo().get_subscriber_changes(sync_token)
+            partners += changes['partners']
+            sync_token = changes['sync_token']
+            done = changes['done']
+        self._set_subscriber_push_token(sync_token)
+
+        push_fields = ['id', 'active'] + [fname for fname in SUBSCRIBER_PUSH_FIELDS if fname in self._get_subscriber_fields()]
+        payload = {'partners': [{fname: partner[fname] for fname in push_fields} for partner in partners]}
+        if not payload['partners']:
+            return
+        configs = self.sudo().search([('state', '=', 'opened')]).config_id
+        for config in configs:
+            self.env['bus.bus']._sendone(config._get_subscriber_channel(), 'new_modules_customization.subscriber_update', payload)
+
+    def _add_subscriber_category_names(self, partners):
+        """Add the category names of the partners as ``subscriber_categories``
+        so that the payment screen does not have to read them"""
+        if 'category_id' not in self._get_subscriber_fields():
+            return
+        category_ids = {category_id for partner in partners for category_id in partner.get('category_id') or []}
+        names = {category.id: category.name for category in self.env['res.partner.category'].browse(category_ids)}
+        for partner in partners:
+            partner['subscriber_categories'] = ', '.join(
+                names[category_id] for category_id in partner.get('category_id') or [] if category_id in names
+            )
@@ -1,4 +1,5 @@
-from odoo import models, fields
+from odoo import models, fields, _
+from odoo.exceptions import MissingError
 
 
 class ProductTemplateAutoTrack(models.Model):
@@ -60,4 +61,95 @@ class ProductTemplateAutoTrack(models.Model):
                 not field.related and  # Skip related fields
                 field.store):  # Only stored fields
                 
-                field.tracking = True
\ No newline at end of file
+                field.tracking = True
+
+    def _message_track(self, fields_iter, initial_values_dict):
+        """Log the tracking of all modified templates at once
+
+        Initial values are accumulated per record during the transaction and
+        tracked at pre-commit, so each template gets at most one message per
+        transaction. The messages and their tracking values are created in a
+        single batch instead of one ``_message_log`` per template.
+
+        With the ``tracking_summary`` context key (e.g. for bulk imports and
+        synchronisations), no tracking values are stored: a single note
+        summarising the batch is logged on its first template instead. The
+        key may hold a label used as the note title.
+        """
+        if not fields_iter:
+            return {}
+
+        tracked_fields = self.fields_get(fields_iter, attributes=('string', 'type', 'selection', 'currency_field'))
+        tracking = {}
+        for record in self:
+            try:
+                tracking[record.id] = record._mail_track(tracked_fields, initial_values_dict[record.id])
+            except MissingError:
+                continue
+
+        bodies = self.env.cr.precommit.data.pop(f'mail.tracking.message.{self._name}', {})
+        changed_records = self.filtered(lambda r: tracking.get(r.id, (None, None))[0])
+        if not changed_records:
+            return tracking
+
+        if self.env.context.get('tracking_summary'):
+            changed_records._message_log_tracking_summary(tracking, tracked_fields)
+            return tracking
+
+        # Long descriptions are stored as deltas rather than full copies
+        text_field_ids = {
+            self.env['ir.model.fields']._get(self._name, fname).id
+            for fname, field_info in tracked_fields.items() if field_info['type'] == 'text'
+        }
+        if text_field_ids:
+            self.env['mail.tracking.value']._compact_tracking_commands(self._name, {
+                record.id: tracking[record.id][1] for record in changed_records
+            }, text_field_ids)
+
+        author_id, email_from = self._message_compute_author(None, None, raise_on_email=False)
+        base_message_values = {
+            'author_id': author_id,
+            'email_from': email_from,
+            'is_internal': True,
+            'message_type': 'notification',
+            'model': self._name,
+            'partner_ids': [],
+            'reply_to': self.env['mail.thread']._notify_get_reply_to(default=email_from)[False],
+            'subtype_id': self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note'),
+        }
+        values_list = []
+        for record in changed_records:
+            changes, tracking_value_ids = tracking[record.id]
+            subtype = record._track_subtype({fname: initial_values_dict[record.id][fname] for fname in changes})
+            if subtype:
+                # Subtyped changes notify followers and keep the standard flow
+                record.message_post(
+                    body=bodies.get(record.id) or '',
+                    subtype_id=subtype.id,
+                    tracking_value_ids=tracking_value_ids,
+                )
+            elif tracking_value_ids:
+                values_list.append(dict(
+                    base_message_values,
+                    res_id=record.id,
+                    body=bodies.get(record.id) or '',
+                    tracking_value_ids=tracking_value_ids,
+                ))
+        if values_list:
+            self.sudo()._message_create(values_list)
+        return tracking
+
+    def _message_log_tracking_summary(self, tracking, tracked_fields):
+        """Log one note describing the changes of all templates in ``self``"""
+        changed_fnames = set()
+        for record in self:
+            changed_fnames.update(tracking[record.id][0])
+        field_labels = sorted(tracked_fields[fname]['string'] for fname in changed_fnames)
+        summary = self.env.context.get('tracking_summary')
+        title = summary if isinstance(summary, str) else _('Bulk update')
+        self[:1]._message_log(body=_(
+            '%(title)s: %(count)s products updated (%(fields)s).',
+            title=title,
+            count=len(self),
+            fields=', '.join(field_labels),
+        ))
@@ -0,0 +1,98 @@
+from odoo import api, fields, models
+from .utils import commit
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductTemplateTrackingSnapshot(models.Model):
+    _name = 'product.template.tracking.snapshot'
+    _description = 'Product Change History Snapshot'
+    _order = 'period desc, product_tmpl_id, field_id'
+
+    product_tmpl_id = fields.Many2one('product.template', string='Product', required=True, readonly=True,
+                                      index=True, ondelete='cascade')
+    field_id = fields.Many2one('ir.model.fields', string='Field', required=True, readonly=True, ondelete='cascade')
+    period = fields.Date(string='Month', required=True, readonly=True)
+    change_count = fields.Integer(string='Changes', readonly=True)
+    first_change_date = fields.Datetime(string='First Change', readonly=True)
+    last_change_date = fields.Datetime(string='Last Change', readonly=True)
+    last_value = fields.Text(string='Value at End of Month', readonly=True)
+
+    _sql_constraints = [
+        ('product_field_period_uniq', 'unique(product_tmpl_id, field_id, period)',
+         'Only one snapshot is allowed per product, field and month.'),
+    ]
+
+    @api.model
+    def _cron_compact_history(self, batch_size=1000):
+        """Roll product tracking values older than the retention period up
+        into monthly snapshots and delete them, one batch per transaction
+
+        The retention period is given in days by the
+        ``new_modules_customization.tracking_retention_days`` system
+        parameter (365 by default).
+        """
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'new_modules_customization.tracking_retention_days', 365))
+        cutoff = fields.Datetime.now() - timedelta(days=retention_days)
+        TrackingValue = self.env['mail.tracking.value'].sudo()
+        while True:
+            trackings = TrackingValue.search([
+                ('mail_message_id.model', '=', 'product.template'),
+                ('mail_message_id.date', '<', cutoff),
+                ('field_id', '!=', False),
+            ], order='id', limit=batch_size)
+            if not trackings:
+                break
+            self._roll_up(trackings)
+            messages = trackings.mail_message_id
+            trackings.unlink()
+            # Drop the tracking messages left without content
+            messages.filtered(
+                lambda m: m.message_type == 'notification' and not m.tracking_value_ids and not m.body
+            ).unlink()
+            _logger.info("Compacted %s product tracking values", len(trackings))
+            commit(self.env)
+
+    @api.model
+    def _roll_up(self, trackings):
+        """Merge tracking values into the snapshots of their month"""
+        new_values = {
+            values['id']: values['newValue']['value']
+            for values in trackings._tracking_value_format()
+        }
+        groups = {}
+        for tracking in trackings.sorted('id'):
+            message = tracking.mail_message_id
+            key = (message.res_id, tracking.field_id.id, message.date.date().replace(day=1))
+            group = groups.setdefault(key, {
+                'change_count': 0,
+                'first_change_date': message.date,
+            })
+            group['change_count'] += 1
+            group['last_change_date'] = message.date
+            group['last_value'] = new_values.get(tracking.id)
+
+        # Changes of deleted products are dropped with their tracking values
+        product_ids = set(self.env['product.template'].browse({key[0] for key in groups}).exists().ids)
+        groups = {key: group for key, group in groups.items() if key[0] in product_ids}
+
+        existing = self.search([
+            ('product_tmpl_id', 'in', list({key[0] for key in groups})),
+            ('period', 'in', list({key[2] for key in groups})),
+        ])
+        snapshots = {(s.product_tmpl_id.id, s.field_id.id, s.period): s for s in existing}
+        vals_list = []
+        for key, group in groups.items():
+            snapshot = snapshots.get(key)
+            if snapshot:
+                snapshot.write({
+                    'change_count': snapshot.change_count + group['change_count'],
+                    'last_change_date': group['last_change_date'],
+                    'last_value': group['last_value'],
+                })
+            else:
+                vals_list.append(dict(group, product_tmpl_id=key[0], field_id=key[1], period=key[2]))
+        self.create(vals_list)
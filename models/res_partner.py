@@ -0,0 +1,13 @@
+from odoo import models
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    def init(self):
+        super().init()
+        # Delta lookups of the POS subscriber synchronisation
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS res_partner_write_date_id_index
+                ON res_partner (write_date, id)
+        """)
@@ -0,0 +1,37 @@
+from odoo import api, sql_db
+from odoo.tools import config
+from contextlib import contextmanager
+
+# Option of the Odoo configuration file giving the DSN of the database
+# (usually a streaming replica) used for read-only previews
+SNAPSHOT_DSN_OPTION = 'new_modules_customization_snapshot_dsn'
+
+
+@contextmanager
+def snapshot_env(env, replica=True):
+    """Yield an environment bound to a separate read-only cursor running at
+    REPEATABLE READ isolation
+
+    Every query of the block sees the same snapshot, takes no row locks and
+    leaves the transaction of ``env`` alone, so long previews do not compete
+    with the writes of the worker. The cursor connects to the DSN given by
+    the ``new_modules_customization_snapshot_dsn`` configuration option,
+    e.g. ``postgresql://odoo@replica/<database>``, or opens a second
+    connection to the current database when it is not set. A replica must
+    serve the database under the same name. With ``replica=False`` the
+    cursor always reads the current database, e.g. for snapshots that must
+    be ordered with the availability version read in them.
+
+    Uncommitted changes of ``env`` are not visible in the snapshot; any
+    decision taken on its data must be checked again in the main
+    transaction.
+    """
+    dsn = replica and config.get(SNAPSHOT_DSN_OPTION)
+    connection = sql_db.db_connect(dsn, allow_uri=True) if dsn else sql_db.db_connect(env.cr.dbname)
+    cr = connection.cursor()
+    try:
+        cr.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield api.Environment(cr, env.uid, env.context)
+    finally:
+        cr.rollback()
+        cr.close()
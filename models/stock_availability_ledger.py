@@ -0,0 +1,196 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Ledger totals of products over location subtrees, given as parallel
+# arrays of (root location, member location) pairs
+LEDGER_TOTALS_QUERY = """
+    SELECT ledger.product_id, tree.root_id, SUM(ledger.quantity), SUM(ledger.reserved_quantity)
+      FROM unnest(%(root_ids)s::int[], %(member_ids)s::int[]) AS tree(root_id, member_id)
+      JOIN stock_availability_ledger AS ledger ON ledger.location_id = tree.member_id
+     WHERE ledger.product_id = ANY(%(product_ids)s)
+     GROUP BY ledger.product_id, tree.root_id
+"""
+
+
+class StockAvailabilityLedger(models.Model):
+    _name = 'stock.availability.ledger'
+    _description = 'Stock Availability Ledger'
+    _order = 'product_id, location_id'
+
+    product_id = fields.Many2one('product.product', string='Product', required=True, readonly=True, ondelete='cascade')
+    location_id = fields.Many2one('stock.location', string='Location', required=True, readonly=True, ondelete='cascade')
+    quantity = fields.Float(string='On Hand', readonly=True, digits='Product Unit of Measure')
+    reserved_quantity = fields.Float(string='Reserved', readonly=True, digits='Product Unit of Measure')
+
+    _sql_constraints = [
+        ('product_location_uniq', 'unique(product_id, location_id)',
+         'Only one ledger row is allowed per product and location.'),
+    ]
+
+    @api.model
+    def _apply_deltas(self, deltas):
+        """Add quantity deltas to the ledger rows, creating missing rows
+
+        :param deltas: dict {(product_id, location_id): [quantity,
+            reserved_quantity]} of signed differences
+        """
+        rows = sorted(
+            (key, values) for key, values in deltas.items()
+            if key[0] and key[1] and any(values)
+        )
+        if not rows:
+            return
+        # Rows are sorted by key so that concurrent upserts lock them in the
+        # same order and cannot deadlock each other.
+        self.env.cr.execute("""
+            INSERT INTO stock_availability_ledger AS ledger
+                (product_id, location_id, quantity, reserved_quantity,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT delta.product_id, delta.location_id, delta.quantity, delta.reserved_quantity,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM unnest(%(product_ids)s::int[], %(location_ids)s::int[], %(quantities)s::float8[],
+                          %(reserved_quantities)s::float8[])
+                   AS delta(product_id, location_id, quantity, reserved_quantity)
+            ON CONFLICT (product_id, location_id) DO UPDATE
+               SET quantity = ledger.quantity + EXCLUDED.quantity,
+                   reserved_quantity = ledger.reserved_quantity + EXCLUDED.reserved_quantity,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'uid': self.env.uid,
+            'product_ids': [key[0] for key, _values in rows],
+            'location_ids': [key[1] for key, _values in rows],
+            'quantities': [values[0] for _key, values in rows],
+            'reserved_quantities': [values[1] for _key, values in rows],
+        })
+        self.invalidate_model()
+
+    @api.model
+    def _read_totals(self, keys):
+        """Sum the ledger rows of the given (product_id, location_id) pairs
+        over each location and all its sub-locations
+
+        :return: dict {key: {'quantity', 'reserved_quantity'}} with zero
+            totals for pairs that have no row
+        """
+        totals = {key: {'quantity': 0.0, 'reserved_quantity': 0.0} for key in keys}
+        if not totals:
+            return totals
+        root_ids, member_ids = self.env['stock.location']._get_subtree_pairs(
+            {location_id for _product_id, location_id in totals})
+        self.env.cr.execute(LEDGER_TOTALS_QUERY, {
+            'root_ids': root_ids,
+            'member_ids': member_ids,
+            'product_ids': list({product_id for product_id, _location_id in totals}),
+        })
+        for product_id, location_id, quantity, reserved_quantity in self.env.cr.fetchall():
+            if (product_id, location_id) in totals:
+                totals[product_id, location_id] = {
+                    'quantity': quantity,
+                    'reserved_quantity': reserved_quantity,
+                }
+        return totals
+
+    @api.model
+    def _rebuild(self):
+        """Recompute the whole ledger from the quants
+
+        The ledger is locked in the current transaction, whose snapshot must
+        not be older than the lock to see every committed quant: see
+        :meth:`action_rebuild`.
+        """
+        self.env.flush_all()
+        # Block delta upserts of concurrent transactions during the rebuild
+        self.env.cr.execute("LOCK TABLE stock_availability_ledger IN EXCLUSIVE MODE")
+        self.env.cr.execute("DELETE FROM stock_availability_ledger")
+        self.env.cr.execute(f"""
+            INSERT INTO stock_availability_ledger
+                (product_id, location_id, quantity, reserved_quantity,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT live.product_id, live.location_id, live.quantity, live.reserved_quantity,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM ({self._get_live_totals_query()}) AS live
+        """, {'uid': self.env.uid})
+        _logger.info("Availability ledger rebuilt: %s rows", self.env.cr.rowcount)
+        self.invalidate_model()
+        self.env['stock.move']._invalidate_availability_cache()
+
+    @api.model
+    def _verify(self):
+        """Compare the ledger with totals computed from scratch
+
+        :return: list of (product_id, location_id) pairs whose ledger row
+            differs from the live totals
+        """
+        self.env.flush_all()
+        self.env.cr.execute(f"""
+            SELECT COALESCE(ledger.product_id, live.product_id),
+                   COALESCE(ledger.location_id, live.location_id)
+              FROM stock_availability_ledger AS ledger
+              FULL OUTER JOIN ({self._get_live_totals_query()}) AS live
+                ON live.product_id = ledger.product_id
+               AND live.location_id = ledger.location_id
+             WHERE abs(COALESCE(ledger.quantity, 0) - COALESCE(live.quantity, 0)) > 0.0001
+                OR abs(COALESCE(ledger.reserved_quantity, 0) - COALESCE(live.reserved_quantity, 0)) > 0.0001
+        """)
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _get_live_totals_query(self):
+        """SQL aggregating the quants per pair"""
+        return """
+            SELECT product_id, location_id,
+                   SUM(quantity) AS quantity,
+                   SUM(reserved_quantity) AS reserved_quantity
+              FROM stock_quant
+             GROUP BY product_id, location_id
+        """
+
+    @api.model
+    def action_rebuild(self):
+        """Rebuild the ledger and check it against the live totals
+
+        The request snapshot predates the lock, so both run in a new cursor
+        locking the ledger before its first read: quants committed while it
+        waited for the lock are included.
+        """
+        with self.env.registry.cursor() as cr:
+            cr.execute("LOCK TABLE stock_availability_ledger IN EXCLUSIVE MODE")
+            ledger = self.with_env(self.env(cr=cr))
+            ledger._rebuild()
+            mismatches = ledger._verify()
+            if mismatches:
+                raise UserError(_(
+                    'The availability ledger still differs from the stock for %s product/location pairs '
+                    'after the rebuild.'
+                ) % len(mismatches))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'message': _('The availability ledger has been rebuilt and verified.'),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    @api.model
+    def action_verify(self):
+        """Check the ledger against the live totals without changing it"""
+        mismatches = self._verify()
+        if mismatches:
+            raise UserError(_(
+                'The availability ledger differs from the stock for %s product/location pairs. '
+                'Please rebuild it.'
+            ) % len(mismatches))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'message': _('The availability ledger matches the stock.'),
+            },
+        }
@@ -0,0 +1,148 @@
+from odoo import api, models, tools
+from odoo.osv import expression
+
+
+# Fields of stock.location used by the cached subtrees and access policies
+LOCATION_TREE_FIELDS = {'location_id', 'name', 'usage'}
+
+# System parameter holding the location tree version keying those caches,
+# and the sequence giving its values
+LOCATION_TREE_VERSION_PARAM = 'new_modules_customization.location_tree_version'
+LOCATION_TREE_VERSION_SEQUENCE = 'stock_location_tree_version_seq'
+
+# Groups allowed to see every location in transfers
+UNRESTRICTED_LOCATION_GROUPS = [
+    'base.group_system',  # Administrator
+    # 'stock.group_stock_manager',  # Inventory Manager
+    'new_modules_customization.group_inventory_transfer_manager',
+]
+
+# Locations whose name contains one of these words are hidden from
+# restricted users
+RESTRICTED_LOCATION_NAMES = ['Partners', 'Customer', 'Vendor']
+
+
+class StockLocation(models.Model):
+    _inherit = 'stock.location'
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {LOCATION_TREE_VERSION_SEQUENCE}")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        locations = super().create(vals_list)
+        self._invalidate_location_tree()
+        return locations
+
+    def write(self, vals):
+        result = super().write(vals)
+        if LOCATION_TREE_FIELDS.intersection(vals):
+            self._invalidate_location_tree()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self._invalidate_location_tree()
+        return result
+
+    @api.model
+    def _invalidate_location_tree(self):
+        """Bump the location tree version, which retires the cached location
+        subtrees and access policies, and drop the availability computed
+        from them
+
+        The version is written in the transaction: it is seen at once by the
+        transaction changing the tree and by the others once committed, and
+        a rolled back change leaves the cache entries of the committed
+        version valid. Every bump takes a new value of a sequence, so that a
+        version is never reused with a different tree. The parameter is
+        written in SQL, its ``get_param`` value is not used.
+        """
+        self.env.cr.execute(f"""
+            INSERT INTO ir_config_parameter (key, value)
+            VALUES (%s, nextval('{LOCATION_TREE_VERSION_SEQUENCE}')::text)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+            RETURNING value
+        """, [LOCATION_TREE_VERSION_PARAM])
+        self.env.cr.precommit.data[LOCATION_TREE_VERSION_PARAM] = self.env.cr.fetchone()[0]
+        self.env['stock.move']._invalidate_availability_cache()
+
+    @api.model
+    def _get_location_tree_version(self):
+        """Return the location tree version seen by the current transaction,
+        read once until the next flush"""
+        data = self.env.cr.precommit.data
+        if LOCATION_TREE_VERSION_PARAM not in data:
+            self.env.cr.execute("SELECT value FROM ir_config_parameter WHERE key = %s",
+                                [LOCATION_TREE_VERSION_PARAM])
+            row = self.env.cr.fetchone()
+            data[LOCATION_TREE_VERSION_PARAM] = row and row[0]
+        return data[LOCATION_TREE_VERSION_PARAM]
+
+    @api.model
+    def _get_descendant_ids(self, location_id):
+        """Return the ids of the location and of all its sub-locations
+
+        Resolved with one prefix search on ``parent_path`` and cached until
+        the location tree changes.
+        """
+        return self._get_descendant_ids_cached(location_id, self._get_location_tree_version())
+
+    @api.model
+    @tools.ormcache('location_id', 'version')
+    def _get_descendant_ids_cached(self, location_id, version):
+        self.flush_model(['parent_path'])
+        self.env.cr.execute("""
+            SELECT child.id
+              FROM stock_location AS child
+              JOIN stock_location AS parent ON child.parent_path LIKE parent.parent_path || '%%'
+             WHERE parent.id = %s
+        """, [location_id])
+        return tuple(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _get_subtree_pairs(self, location_ids):
+        """Return parallel lists (root_ids, member_ids) pairing each of the
+        given locations with itself and all its sub-locations, for the
+        subtree aggregates joining on ``unnest()``"""
+        root_ids, member_ids = [], []
+        for root_id in location_ids:
+            descendant_ids = self._get_descendant_ids(root_id)
+            root_ids.extend([root_id] * len(descendant_ids))
+            member_ids.extend(descendant_ids)
+        return root_ids, member_ids
+
+    def _get_ancestor_ids(self):
+        """Return the ids of the location and of all its parent locations"""
+        self.ensure_one()
+        return [int(location_id) for location_id in (self.parent_path or '').split('/') if location_id]
+
+    @api.model
+    def _get_location_access_policy(self):
+        """Return the location access policy of the current user
+
+        The policy only depends on the groups of the user, so it is cached
+        per set of groups and location tree version: a change of either
+        makes a new cache key, without clearing any cache.
+
+        :return: tuple (unrestricted, can_validate, excluded_location_ids):
+            whether the user sees every location, whether they may validate
+            outgoing transfers, and the internal or view locations hidden
+            from them when restricted
+        """
+        return self._get_location_access_policy_cached(
+            tuple(sorted(self.env.user.groups_id.ids)), self._get_location_tree_version())
+
+    @api.model
+    @tools.ormcache('group_ids', 'version')
+    def _get_location_access_policy_cached(self, group_ids, version):
+        user = self.env.user
+        unrestricted = any(user.has_group(group) for group in UNRESTRICTED_LOCATION_GROUPS)
+        can_validate = user.has_group('new_modules_customization.group_inventory_transfer_manager')
+        excluded_location_ids = ()
+        if not unrestricted:
+            domain = [('usage', 'in', ['internal', 'view'])]
+            domain += expression.OR([[('name', 'ilike', name)] for name in RESTRICTED_LOCATION_NAMES])
+            excluded_location_ids = tuple(self.sudo().with_context(active_test=False).search(domain).ids)
+        return unrestricted, can_validate, excluded_location_ids
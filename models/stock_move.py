@@ -1,136 +1,436 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from .diagnostics import diagnostics
+from .snapshot import snapshot_env
+from collections import defaultdict
 import logging
+import time
 
 _logger = logging.getLogger(__name__)
 
+AVAILABILITY_CACHE_KEY = 'new_modules_customization.availability'
+
+# Sequence advanced after every commit changing the availability totals
+AVAILABILITY_VERSION_SEQUENCE = 'stock_availability_version_seq'
+
+RESERVED_MOVE_STATES = ('partially_available', 'assigned')
+
+PENDING_MOVE_STATES = ('waiting', 'confirmed', 'partially_available', 'assigned')
+
+# Lock waits longer than this (in seconds) are reported in the log
+LOCK_WAIT_REPORT_THRESHOLD = 0.05
+
+# Fields of stock.move affecting the pending outgoing totals
+AVAILABILITY_MOVE_FIELDS = {'state', 'product_id', 'location_id', 'product_uom_qty', 'quantity', 'picking_type_id'}
+
+# Unreserved pending outgoing demand of products over location subtrees,
+# given as parallel arrays of (root location, member location) pairs. The
+# reserved part of the demand is already in the reserved quantity of the
+# quants. Filtering on the outgoing picking type ids avoids the join and
+# matches the partial index stock_move_pending_out_qty_index.
+PENDING_OUT_QUERY = """
+    SELECT move.product_id, tree.root_id, SUM(GREATEST(move.product_uom_qty - move.quantity, 0))
+      FROM unnest(%(root_ids)s::int[], %(member_ids)s::int[]) AS tree(root_id, member_id)
+      JOIN stock_move AS move ON move.location_id = tree.member_id
+     WHERE move.picking_type_id = ANY(%(outgoing_type_ids)s)
+       AND move.product_id = ANY(%(product_ids)s)
+       AND move.state IN %(states)s
+     GROUP BY move.product_id, tree.root_id
+"""
+
+
+def get_own_quantity(state, demand, quantity):
+    """Return the part of the reserved and pending outgoing totals of its
+    pair that an outgoing move accounts for itself"""
+    own_quantity = 0.0
+    if state in PENDING_MOVE_STATES:
+        own_quantity += max(demand - quantity, 0.0)
+    if state in RESERVED_MOVE_STATES:
+        own_quantity += quantity
+    return own_quantity
+
+
 class StockMove(models.Model):
     _inherit = 'stock.move'
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {AVAILABILITY_VERSION_SEQUENCE}")
+        # Covering partial index turning the pending outgoing aggregate into
+        # an index-only scan
+        self.env.cr.execute(f"""
+            CREATE INDEX IF NOT EXISTS stock_move_pending_out_qty_index
+                ON stock_move (picking_type_id, product_id, location_id)
+                INCLUDE (product_uom_qty, quantity)
+             WHERE state IN {PENDING_MOVE_STATES}
+        """)
     
     @api.constrains('product_uom_qty')
     def _check_available_quantity(self):
         """Validate that transfer quantity doesn't exceed available quantity"""
-        _logger.info("=== STOCK MOVE QUANTITY VALIDATION ===")
+        trace = diagnostics.active(self.env, lambda: self.picking_id.ids)
+        
+        # One aggregated pass for every (product, location) pair of the batch
+        available_quantities = self._get_available_quantities()
         
         for move in self:
-            _logger.info(f"Validating move ID: {move.id}")
-            _logger.info(f"Product: {move.product_id.name} (ID: {move.product_id.id})")
-            _logger.info(f"Requested quantity: {move.product_uom_qty} {move.product_uom.name}")
-            _logger.info(f"Move state: {move.state}")
-            _logger.info(f"Picking type: {move.picking_type_id.code if move.picking_type_id else 'No picking type'}")
-            
-            # if move.picking_type_id and move.picking_type_id.code == 'outgoing':
-            #     _logger.info("Processing outgoing move - checking available quantity")
+            available_qty = available_quantities[move.id]
+            if trace:
+                diagnostics.trace("Move %s: requested %s, available %s", move.id, move.product_uom_qty, available_qty)
             
-            try:
-                # Get available quantity at source location
-                available_qty = self._get_available_quantity_at_location(
-                    move.product_id, 
-                    move.location_id
+            if move.product_uom_qty > available_qty:
+                error_msg = (
+                    f'Cannot transfer {move.product_uom_qty} {move.product_uom.name} '
+                    f'of product "{move.product_id.display_name}" '
+                    f'from location "{move.location_id.display_name}". '
+                    f'Only {available_qty} available in stock.'
                 )
-                
-                _logger.info(f"Available quantity calculated: {available_qty}")
-                
-                if move.product_uom_qty > available_qty:
-                    error_msg = (
-                        f'Cannot transfer {move.product_uom_qty} {move.product_uom.name} '
-                        f'of product "{move.product_id.display_name}" '
-                        f'from location "{move.location_id.display_name}". '
-                        f'Only {available_qty} available in stock.'
-                    )
-                    _logger.error(f"QUANTITY VALIDATION FAILED: {error_msg}")
-                    raise ValidationError(_(error_msg))
-                else:
-                    _logger.info("✓ Quantity validation passed")
-                    
-            except Exception as e:
-                _logger.error(f"Error during quantity validation: {str(e)}")
-                raise
-            # else:
-            #     _logger.info("Skipping validation - not an outgoing move")
-                    
+                raise ValidationError(_(error_msg))
+
+    def _get_availability_key(self):
+        """Return the (product, location) key used by the availability engine"""
+        self.ensure_one()
+        return (self.product_id.id, self.location_id.id)
+
+    def _get_available_quantities(self, snapshot=False):
+        """Calculate available quantities for all moves of the recordset at once
+
+        Moves whose picking type uses the projected availability mode get the
+        on hand quantity minus the reserved and unreserved pending outgoing
+        quantities of the other moves; the others get the on hand quantity.
+        Each move only adds back its own share of these totals, so that
+        moves of the same pair checked together still compete.
+
+        :param snapshot: read the stock totals on a separate read-only
+            snapshot cursor (see ``snapshot_env``), for previews only
+        :return: dict {move id: available quantity}
+        """
+        keys = self._get_availability_keys()
+        if snapshot:
+            with snapshot_env(self.env) as env:
+                totals = env['stock.move']._read_availability(keys)
+        else:
+            totals = self._read_availability(keys)
+
+        available_quantities = {}
+        for move in self:
+            key = move._get_availability_key()
+            available_qty = totals[key]['quantity']
+            if move.picking_type_id.availability_mode == 'projected':
+                # The move's own reservation and pending demand must not
+                # reduce its projected availability
+                own_quantity = 0.0
+                if move.picking_type_id.code == 'outgoing':
+                    own_quantity = get_own_quantity(move.state, move.product_uom_qty, move.quantity)
+                available_qty -= (
+                    totals[key]['reserved_quantity']
+                    + totals[key]['pending_out_qty']
+                    - own_quantity
+                )
+            available_quantities[move.id] = available_qty
+        return available_quantities
+
+    @api.model
+    def _read_availability(self, keys):
+        """Aggregate stock totals for a set of (product_id, location_id) pairs,
+        each location including the stock of all its sub-locations
+
+        Pairs already computed in the current transaction are served from
+        the availability cache. For the others, the on hand and reserved
+        quantities are read from the availability ledger, one indexed row
+        per pair, and the pending outgoing demand from the moves through
+        their partial index. Setting the system parameter
+        ``new_modules_customization.availability_source`` to ``live`` makes
+        the quantities computed from the quants instead.
+
+        :param keys: iterable of (product_id, location_id) tuples
+        :return: dict {key: {'quantity', 'reserved_quantity', 'pending_out_qty'}}
+        """
+        # Pending recomputations of the moves invalidate cached pairs
+        self.flush_model(AVAILABILITY_MOVE_FIELDS)
+        cache = self._get_availability_cache()
+        keys = set(keys)
+        missing_keys = keys - cache.keys()
+        if missing_keys:
+            source = self.env['ir.config_parameter'].sudo().get_param(
+                'new_modules_customization.availability_source', 'ledger')
+            if source == 'live':
+                totals = self._read_availability_live(missing_keys)
+            else:
+                totals = self.env['stock.availability.ledger']._read_totals(missing_keys)
+            pending_out = self._read_pending_out(missing_keys)
+            for key, values in totals.items():
+                values['pending_out_qty'] = pending_out[key]
+            cache.update(totals)
+        return {key: cache[key] for key in keys}
+
+    @api.model
+    def _read_availability_live(self, keys):
+        """Compute the on hand and reserved quantities from the quants with
+        one grouped query"""
+        totals = {key: {'quantity': 0.0, 'reserved_quantity': 0.0} for key in keys}
+        if not keys:
+            return totals
+
+        product_ids = list({product_id for product_id, _location_id in keys})
+        # Map every sub-location to the requested locations containing it
+        Location = self.env['stock.location']
+        root_ids_by_location = defaultdict(list)
+        for root_id in {location_id for _product_id, location_id in keys}:
+            for location_id in Location._get_descendant_ids(root_id):
+                root_ids_by_location[location_id].append(root_id)
+        location_ids = list(root_ids_by_location)
+
+        # Get current and reserved quantity on hand
+        quant_groups = self.env['stock.quant']._read_group(
+            [('product_id', 'in', product_ids), ('location_id', 'in', location_ids)],
+            ['product_id', 'location_id'],
+            ['quantity:sum', 'reserved_quantity:sum'],
+        )
+        for product, location, quantity, reserved_quantity in quant_groups:
+            for root_id in root_ids_by_location[location.id]:
+                key = (product.id, root_id)
+                if key in totals:
+                    totals[key]['quantity'] += quantity
+                    totals[key]['reserved_quantity'] += reserved_quantity
+        return totals
+
+    @api.model
+    def _read_pending_out(self, keys):
+        """Sum the demand of the pending outgoing moves of the pairs over
+        each location and all its sub-locations
+
+        Read from the moves rather than kept in the ledger, so that
+        confirming outgoing moves does not update shared ledger rows.
+
+        :return: dict {key: pending outgoing quantity}
+        """
+        pending_out = dict.fromkeys(keys, 0.0)
+        if not pending_out:
+            return pending_out
+        root_ids, member_ids = self.env['stock.location']._get_subtree_pairs(
+            {location_id for _product_id, location_id in pending_out})
+        self.env.cr.execute(PENDING_OUT_QUERY, {
+            'root_ids': root_ids,
+            'member_ids': member_ids,
+            'outgoing_type_ids': self._get_outgoing_type_ids(),
+            'product_ids': list({product_id for product_id, _location_id in pending_out}),
+            'states': PENDING_MOVE_STATES,
+        })
+        for product_id, location_id, quantity in self.env.cr.fetchall():
+            if (product_id, location_id) in pending_out:
+                pending_out[product_id, location_id] = quantity
+        return pending_out
+
+    @api.model
+    def _get_outgoing_type_ids(self):
+        return self.env['stock.picking.type'].with_context(active_test=False).search([
+            ('code', '=', 'outgoing'),
+        ]).ids
+
+    @api.model
+    def _get_availability_cache(self):
+        """Return the availability cache of the current transaction
+
+        The cache lives in the precommit data of the cursor, so it is shared
+        by every environment of the transaction and dropped on commit or
+        rollback.
+        """
+        return self.env.cr.precommit.data.setdefault(AVAILABILITY_CACHE_KEY, {})
+
+    @api.model
+    def _invalidate_availability_cache(self, keys=None):
+        """Drop cached availability for the given (product_id, location_id)
+        pairs, or the whole cache when no keys are given, and bump the
+        availability version once the transaction is committed"""
+        self._bump_availability_version()
+        cache = self.env.cr.precommit.data.get(AVAILABILITY_CACHE_KEY)
+        if not cache:
+            return
+        if keys is None:
+            cache.clear()
+            return
+        # A change in a sub-location also changes the totals of its parents
+        locations = self.env['stock.location'].browse({location_id for _product_id, location_id in keys})
+        ancestor_ids = {location.id: location._get_ancestor_ids() for location in locations.exists()}
+        for product_id, location_id in keys:
+            for ancestor_id in ancestor_ids.get(location_id, [location_id]):
+                cache.pop((product_id, ancestor_id), None)
+
+    @api.model
+    def _get_availability_version(self):
+        """Return the current availability version
+
+        The version is a sequence, advanced after the commit of every
+        transaction changing the availability totals. Read by the first
+        statement of a transaction, it is therefore bumped again after any
+        change missing from the snapshot of the transaction.
+        """
+        self.env.cr.execute(f"SELECT last_value FROM {AVAILABILITY_VERSION_SEQUENCE}")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _bump_availability_version(self):
+        """Advance the availability version after the commit of the
+        current transaction, once per transaction"""
+        postcommit = self.env.cr.postcommit
+        if postcommit.data.get(AVAILABILITY_VERSION_SEQUENCE):
+            return
+        postcommit.data[AVAILABILITY_VERSION_SEQUENCE] = True
+        registry = self.env.registry
+
+        @postcommit.add
+        def bump_version():
+            # Sequences are not transactional, the bump is visible at once
+            with registry.cursor() as cr:
+                cr.execute(f"SELECT nextval('{AVAILABILITY_VERSION_SEQUENCE}')")
+
     def _get_available_quantity_at_location(self, product, location):
         """Calculate available quantity for product at specific location"""
-        _logger.info(f"--- Calculating available quantity ---")
-        _logger.info(f"Product: {product.name} (ID: {product.id})")
-        _logger.info(f"Location: {location.display_name} (ID: {location.id})")
-        
-        try:
-            # Get current quantity on hand
-            quants = self.env['stock.quant'].search([
-                ('product_id', '=', product.id),
-                ('location_id', '=', location.id)
-            ])
-            
-            _logger.info(f"Found {len(quants)} quant records")
-            
-            current_qty = 0
-            for quant in quants:
-                _logger.info(f"  Quant ID {quant.id}: quantity = {quant.quantity}")
-                current_qty += quant.quantity
-            
-            _logger.info(f"Total current quantity: {current_qty}")
-            
-            # Subtract quantities from pending outgoing moves
-            pending_out_moves = self.env['stock.move'].search([
-                ('product_id', '=', product.id),
-                ('location_id', '=', location.id),
-                ('state', 'in', ['waiting', 'confirmed', 'assigned']),
-                ('picking_type_id.code', '=', 'outgoing'),
-                ('id', '!=', self.id)  # Exclude current move
-            ])
-            
-            _logger.info(f"Found {len(pending_out_moves)} pending outgoing moves")
-            
-            pending_out_qty = 0
-            for pending_move in pending_out_moves:
-                _logger.info(f"  Pending move ID {pending_move.id}: {pending_move.product_uom_qty} {pending_move.product_uom.name}")
-                pending_out_qty += pending_move.product_uom_qty
-            
-            _logger.info(f"Total pending outgoing quantity: {pending_out_qty}")
-            
-            # available_qty = current_qty - pending_out_qty
-            # Get reserved quantities from quants
-            reserved_qty = sum(quants.mapped('reserved_quantity'))
-            # available_qty = current_qty - reserved_qty
-            available_qty = current_qty 
-            
-            _logger.info(f"Final available quantity: {available_qty} ({current_qty} - {pending_out_qty})")
-            
-            return available_qty
-            
-        except Exception as e:
-            _logger.error(f"Error calculating available quantity: {str(e)}")
-            _logger.error(f"Product ID: {product.id}, Location ID: {location.id}")
-            raise
+        key = (product.id, location.id)
+        return self._read_availability([key])[key]['quantity']
 
-    # Optional: Add logging to standard move methods for better tracking
-    def _action_confirm(self, merge=True, merge_into=False):
-        """Add logging to move confirmation"""
-        _logger.info(f"=== CONFIRMING STOCK MOVE ===")
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super().create(vals_list)
+        moves._invalidate_availability_cache(moves._get_availability_keys())
+        return moves
+
+    def write(self, vals):
+        if not AVAILABILITY_MOVE_FIELDS.intersection(vals):
+            return super().write(vals)
+        keys = self._get_availability_keys()
+        result = super().write(vals)
+        self._invalidate_availability_cache(keys | self._get_availability_keys())
+        return result
+
+    def unlink(self):
+        self._invalidate_availability_cache(self._get_availability_keys())
+        return super().unlink()
+
+    def _compute_picking_type_id(self):
+        # Stored compute, written without going through write()
+        super()._compute_picking_type_id()
+        self._invalidate_availability_cache(self._get_availability_keys())
+
+    def _compute_quantity(self):
+        # Stored compute, written without going through write()
+        super()._compute_quantity()
+        self._invalidate_availability_cache(self._get_availability_keys())
+
+    def _get_availability_keys(self):
+        """Return the set of (product_id, location_id) pairs of the moves"""
+        return {move._get_availability_key() for move in self}
+
+    def _lock_availability_keys(self):
+        """Serialize transactions consuming the same stock
+
+        Takes transaction-level PostgreSQL advisory locks on the (product,
+        location) keys of the moves: an exclusive lock on the source location
+        and shared locks on its parent locations. Moves of the same product
+        in sibling bins run in parallel, while a move from a parent location
+        waits for the moves of its sub-locations and conversely. Locks are
+        taken in sorted order to avoid deadlocks and released at the end of
+        the transaction.
+
+        A transaction that had to wait still reads the snapshot it started
+        with; its quant and ledger updates then fail with a serialization
+        error and the request is retried. Callers that can should take the
+        locks before their snapshot is established, as the transfer
+        validation does (see ``stock.picking._button_validate_on_fresh_snapshot``).
+        Keys listed in the ``availability_locked_keys`` context key are
+        already held for the transaction and skipped.
+
+        :return: time spent waiting for the locks, in seconds
+        """
+        lock_modes = self._get_availability_lock_modes()
+        for key in self.env.context.get('availability_locked_keys', ()):
+            lock_modes.pop(key, None)
+        return self._acquire_availability_locks(lock_modes)
+
+    def _get_availability_lock_modes(self):
+        """Return the availability locks needed by the moves
+
+        :return: dict {(product_id, location_id): exclusive}
+        """
+        lock_modes = {}
         for move in self:
-            _logger.info(f"Confirming move: {move.product_id.name}, Qty: {move.product_uom_qty}")
+            if move.location_id.usage not in ('internal', 'transit'):
+                continue
+            product_id, location_id = move._get_availability_key()
+            lock_modes[product_id, location_id] = True
+            for ancestor_id in move.location_id._get_ancestor_ids():
+                lock_modes.setdefault((product_id, ancestor_id), False)
+        return lock_modes
+
+    @api.model
+    def _acquire_availability_locks(self, lock_modes):
+        """Take the given availability locks in the transaction of the
+        environment
+
+        :param lock_modes: dict {(product_id, location_id): exclusive}
+        :return: time spent waiting for the locks, in seconds
+        """
+        if not lock_modes:
+            return 0.0
+
+        lock_keys = sorted(lock_modes)
+        start = time.monotonic()
+        # unnest() preserves the sorted order of the arrays
+        self.env.cr.execute("""
+            SELECT CASE WHEN lock.exclusive
+                        THEN pg_advisory_xact_lock(lock.product_id, lock.location_id)
+                        ELSE pg_advisory_xact_lock_shared(lock.product_id, lock.location_id)
+                   END
+              FROM unnest(%s::int[], %s::int[], %s::bool[]) AS lock(product_id, location_id, exclusive)
+        """, [
+            [key[0] for key in lock_keys],
+            [key[1] for key in lock_keys],
+            [lock_modes[key] for key in lock_keys],
+        ])
+        lock_wait = time.monotonic() - start
+        if lock_wait > LOCK_WAIT_REPORT_THRESHOLD:
+            _logger.info("Waited %.3fs for availability locks on %s product/location keys", lock_wait, len(lock_keys))
+        return lock_wait
+
+    def _action_confirm(self, merge=True, merge_into=False):
+        """Add tracing to move confirmation"""
+        if diagnostics.active(self.env, lambda: self.picking_id.ids):
+            diagnostics.trace("Confirming moves %s", self.ids)
         
-        result = super()._action_confirm(merge=merge, merge_into=merge_into)
-        _logger.info("Move confirmation completed")
-        return result
+        with self.env['stock.validation.profile']._profile('action_confirm', self):
+            moves = super()._action_confirm(merge=merge, merge_into=merge_into)
+            self.env['stock.move.event']._record('confirm', moves.filtered(lambda m: m.state not in ('draft', 'cancel')))
+            return moves
     
     def _action_assign(self):
-        """Add logging to move assignment"""
-        _logger.info(f"=== ASSIGNING STOCK MOVE ===")
-        for move in self:
-            _logger.info(f"Assigning move: {move.product_id.name}, State: {move.state}")
+        """Add tracing to move assignment"""
+        if diagnostics.active(self.env, lambda: self.picking_id.ids):
+            diagnostics.trace("Assigning moves %s", self.ids)
         
-        result = super()._action_assign()
-        _logger.info("Move assignment completed")
-        return result
+        with self.env['stock.validation.profile']._profile('action_assign', self):
+            previous_states = {move.id: move.state for move in self}
+            result = super()._action_assign()
+            self.env['stock.move.event']._record('assign', self.filtered(
+                lambda m: m.state in RESERVED_MOVE_STATES and previous_states.get(m.id) != m.state
+            ))
+            return result
     
     def _action_done(self, cancel_backorder=False):
-        """Add logging to move completion"""
-        _logger.info(f"=== COMPLETING STOCK MOVE ===")
-        for move in self:
-            _logger.info(f"Completing move: {move.product_id.name}, Final qty: {move.product_uom_qty}")
+        """Add tracing to move completion"""
+        if diagnostics.active(self.env, lambda: self.picking_id.ids):
+            diagnostics.trace("Completing moves %s", self.ids)
         
-        result = super()._action_done(cancel_backorder=cancel_backorder)
-        _logger.info("Move completion done")
-        return result
\ No newline at end of file
+        with self.env['stock.validation.profile']._profile('action_done', self) as stats:
+            stats['lock_wait'] = self._lock_availability_keys()
+            moves = super()._action_done(cancel_backorder=cancel_backorder)
+            self.env['stock.move.event']._record('done', moves.filtered(lambda m: m.state == 'done'))
+            return moves
+
+    def _get_event_quantity(self, event):
+        """Return the quantity of the move recorded for a lifecycle event,
+        in the unit of measure of the product"""
+        self.ensure_one()
+        if event == 'confirm':
+            return self.product_qty
+        return self.product_uom._compute_quantity(self.quantity, self.product_id.uom_id, rounding_method='HALF-UP')
\ No newline at end of file
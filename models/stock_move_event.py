@@ -0,0 +1,132 @@
+from odoo import api, fields, models
+from .utils import commit
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+MOVE_EVENTS = [
+    ('confirm', 'Confirmed'),
+    ('assign', 'Reserved'),
+    ('done', 'Done'),
+]
+
+
+class StockMoveEvent(models.Model):
+    _name = 'stock.move.event'
+    _description = 'Stock Move Event'
+    _order = 'date desc, id desc'
+    # Append-only history, the insertion date is the event date
+    _log_access = False
+
+    move_id = fields.Many2one('stock.move', string='Move', required=True, readonly=True, index=True, ondelete='cascade')
+    product_id = fields.Many2one('product.product', string='Product', required=True, readonly=True, ondelete='cascade')
+    location_id = fields.Many2one('stock.location', string='Location', required=True, readonly=True, ondelete='cascade')
+    event = fields.Selection(MOVE_EVENTS, string='Event', required=True, readonly=True)
+    date = fields.Datetime(string='Date', required=True, readonly=True, index=True)
+    quantity = fields.Float(string='Quantity', readonly=True, digits='Product Unit of Measure')
+    latency = fields.Float(string='Latency (s)', readonly=True,
+                           help="Seconds elapsed since the previous event of the move")
+
+    @api.model
+    def _record(self, event, moves):
+        """Append one event per move with a single multi-row insert
+
+        The latency is measured from the latest event of the same move still
+        in the raw history; it is left empty for the first event of a move.
+        """
+        moves = moves.filtered(lambda m: m.product_id and m.location_id)
+        if not moves:
+            return
+        self.env.cr.execute("""
+            INSERT INTO stock_move_event (move_id, product_id, location_id, event, date, quantity, latency)
+            SELECT e.move_id, e.product_id, e.location_id, %(event)s, now() at time zone 'UTC', e.quantity,
+                   EXTRACT(EPOCH FROM (now() at time zone 'UTC') - (
+                       SELECT MAX(prev.date) FROM stock_move_event AS prev WHERE prev.move_id = e.move_id
+                   ))
+              FROM unnest(%(move_ids)s::int[], %(product_ids)s::int[], %(location_ids)s::int[],
+                          %(quantities)s::float8[]) AS e(move_id, product_id, location_id, quantity)
+        """, {
+            'event': event,
+            'move_ids': moves.ids,
+            'product_ids': [move.product_id.id for move in moves],
+            'location_ids': [move.location_id.id for move in moves],
+            'quantities': [move._get_event_quantity(event) for move in moves],
+        })
+
+    @api.model
+    def _cron_roll_up(self, batch_size=10000):
+        """Compress the events older than the retention period into hourly
+        rollups and delete them, one batch per transaction
+
+        The retention period is given in days by the
+        ``new_modules_customization.move_event_retention_days`` system
+        parameter (7 by default).
+        """
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'new_modules_customization.move_event_retention_days', 7))
+        cutoff = (fields.Datetime.now() - timedelta(days=retention_days)).replace(minute=0, second=0, microsecond=0)
+        while True:
+            # Groups are inserted in key order so that concurrent runs lock
+            # the rollup rows in the same order.
+            self.env.cr.execute("""
+                WITH rolled AS (
+                    DELETE FROM stock_move_event
+                     WHERE id IN (SELECT id FROM stock_move_event
+                                   WHERE date < %(cutoff)s
+                                   ORDER BY id
+                                   LIMIT %(limit)s)
+                 RETURNING date, product_id, location_id, event, quantity, latency
+                ), inserted AS (
+                    INSERT INTO stock_move_event_rollup AS rollup
+                        (date, product_id, location_id, event, event_count, quantity,
+                         latency_count, latency_total, latency_max)
+                    SELECT date_trunc('hour', date), product_id, location_id, event, COUNT(*),
+                           SUM(quantity), COUNT(latency), COALESCE(SUM(latency), 0), MAX(latency)
+                      FROM rolled
+                     GROUP BY date_trunc('hour', date), product_id, location_id, event
+                     ORDER BY date_trunc('hour', date), product_id, location_id, event
+                    ON CONFLICT (date, product_id, location_id, event) DO UPDATE
+                       SET event_count = rollup.event_count + EXCLUDED.event_count,
+                           quantity = rollup.quantity + EXCLUDED.quantity,
+                           latency_count = rollup.latency_count + EXCLUDED.latency_count,
+                           latency_total = rollup.latency_total + EXCLUDED.latency_total,
+                           latency_max = GREATEST(rollup.latency_max, EXCLUDED.latency_max)
+                )
+                SELECT COUNT(*) FROM rolled
+            """, {'cutoff': cutoff, 'limit': batch_size})
+            count = self.env.cr.fetchone()[0]
+            if not count:
+                break
+            _logger.info("Rolled up %s stock move events", count)
+            commit(self.env)
+        self.invalidate_model()
+        self.env['stock.move.event.rollup'].invalidate_model()
+
+
+class StockMoveEventRollup(models.Model):
+    _name = 'stock.move.event.rollup'
+    _description = 'Stock Move Event Hourly Rollup'
+    _order = 'date desc, product_id, location_id, event'
+    _log_access = False
+
+    date = fields.Datetime(string='Hour', required=True, readonly=True, index=True)
+    product_id = fields.Many2one('product.product', string='Product', required=True, readonly=True, ondelete='cascade')
+    location_id = fields.Many2one('stock.location', string='Location', required=True, readonly=True, ondelete='cascade')
+    event = fields.Selection(MOVE_EVENTS, string='Event', required=True, readonly=True)
+    event_count = fields.Integer(string='Moves', readonly=True)
+    quantity = fields.Float(string='Quantity', readonly=True, digits='Product Unit of Measure')
+    latency_count = fields.Integer(string='Timed Moves', readonly=True)
+    latency_total = fields.Float(string='Total Latency (s)', readonly=True)
+    latency_max = fields.Float(string='Max Latency (s)', readonly=True, group_operator='max')
+    latency_avg = fields.Float(string='Average Latency (s)', compute='_compute_latency_avg')
+
+    _sql_constraints = [
+        ('hour_product_location_event_uniq', 'unique(date, product_id, location_id, event)',
+         'Only one rollup is allowed per hour, product, location and event.'),
+    ]
+
+    @api.depends('latency_count', 'latency_total')
+    def _compute_latency_avg(self):
+        for rollup in self:
+            rollup.latency_avg = rollup.latency_total / rollup.latency_count if rollup.latency_count else 0.0
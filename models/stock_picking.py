@@ -1,137 +1,155 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
-import logging
-
-_logger = logging.getLogger(__name__)
+from .diagnostics import diagnostics
 
 class StockPicking(models.Model):
     _inherit = "stock.picking"
 
     def button_validate(self):
         """Override to add quantity validation before transfer"""
-        _logger.info("=== STOCK PICKING VALIDATION START ===")
-        _logger.info(f"Picking ID: {self.id}, Name: {self.name}, Type: {self.picking_type_id.name}")
-        _logger.info(f"User: {self.env.user.name} (ID: {self.env.user.id})")
-        _logger.info(f"Number of moves: {len(self.move_ids)}")
+        if self._can_validate_on_fresh_snapshot():
+            return self._button_validate_on_fresh_snapshot()
+
+        trace = diagnostics.active(self.env, self.ids)
+        if trace:
+            diagnostics.trace("Validating pickings %s for user %s", self.ids, self.env.uid)
         
-        try:
+        with self.env['stock.validation.profile']._profile('button_validate', self.move_ids, self) as stats:
+            # Hold the stock of the checked moves until the transfer is done
+            outgoing_pickings = self.filtered(lambda p: p.picking_type_id.code == 'outgoing')
+            stats['lock_wait'] = self.env.context.get('availability_lock_wait', 0.0) \
+                + outgoing_pickings.move_ids._lock_availability_keys()
             self._validate_transfer_quantities()
-            _logger.info("Quantity validation passed successfully")
             
             result = super().button_validate()
-            _logger.info("Transfer validation completed successfully")
-            return result
-            
-        except ValidationError as e:
-            _logger.error(f"Validation failed: {str(e)}")
-            raise
-        except Exception as e:
-            _logger.error(f"Unexpected error during validation: {str(e)}")
-            raise
+        if trace:
+            diagnostics.trace("Pickings %s validated", self.ids)
+        return result
+
+    def _can_validate_on_fresh_snapshot(self):
+        """Whether the validation can run in a new transaction started once
+        the availability locks are held
+
+        Only for the Validate buttons of the form, which set
+        ``validate_on_fresh_snapshot`` in the context: other callers keep
+        the validation in their transaction, to read its result and roll it
+        back. The current transaction must also have written nothing that
+        the new one would miss, outside of the test cursors sharing one
+        transaction.
+        """
+        if not self.env.context.get('validate_on_fresh_snapshot') \
+                or 'availability_locked_keys' in self.env.context or self.env.registry.in_test_mode():
+            return False
+        if not self.filtered(lambda p: p.picking_type_id.code == 'outgoing').move_ids:
+            return False
+        self.env.flush_all()
+        self.env.cr.execute("SELECT txid_current_if_assigned()")
+        return self.env.cr.fetchone()[0] is None
+
+    def _button_validate_on_fresh_snapshot(self):
+        """Take the availability locks of the outgoing moves, then validate
+        in a new transaction whose snapshot starts after them
+
+        A validation that waited for a concurrent one reads the stock left
+        once that one is committed, so its quantity check is right instead
+        of failing later on a serialization error. The new transaction is
+        committed before the locks are released; the current transaction,
+        which has nothing to commit, does not see its changes.
+        """
+        outgoing_pickings = self.filtered(lambda p: p.picking_type_id.code == 'outgoing')
+        lock_modes = outgoing_pickings.move_ids._get_availability_lock_modes()
+        registry = self.env.registry
+        with registry.cursor() as lock_cr:
+            lock_wait = self.env['stock.move'].with_env(self.env(cr=lock_cr))._acquire_availability_locks(lock_modes)
+            with registry.cursor() as cr:
+                pickings = self.with_env(self.env(cr=cr, context=dict(
+                    self.env.context,
+                    availability_locked_keys=tuple(lock_modes),
+                    availability_lock_wait=lock_wait,
+                )))
+                result = pickings.button_validate()
+        self.env.invalidate_all()
+        # Wizards opened by the validation must take the locks again
+        if isinstance(result, dict) and isinstance(result.get('context'), dict):
+            result['context'] = {
+                key: value for key, value in result['context'].items()
+                if key not in ('availability_locked_keys', 'availability_lock_wait')
+            }
+        return result
+    
+    def action_bulk_validate(self):
+        """Queue the selected transfers for validation in a background job"""
+        job = self.env['stock.picking.bulk.validation'].create({
+            'picking_ids': [(6, 0, self.ids)],
+        })
+        job.action_queue()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'stock.picking.bulk.validation',
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
     
     def _validate_transfer_quantities(self):
         """Validate all move quantities before confirming transfer"""
-        _logger.info("--- Starting transfer quantity validation ---")
+        trace = diagnostics.active(self.env, self.ids)
         
-        for picking in self:
-            _logger.info(f"Validating picking: {picking.name} (Type: {picking.picking_type_id.code})")
-            
-            if picking.picking_type_id.code == 'outgoing':
-                _logger.info("Processing outgoing transfer - checking quantities")
-                
-                for move_index, move in enumerate(picking.move_ids, 1):
-                    _logger.info(f"Move {move_index}/{len(picking.move_ids)}: {move.product_id.name}")
-                    _logger.info(f"  - Requested quantity: {move.product_uom_qty} {move.product_uom.name}")
-                    _logger.info(f"  - Source location: {move.location_id.display_name}")
-                    
-                    if move.product_uom_qty > 0:
-                        try:
-                            available_qty = move._get_available_quantity_at_location(
-                                move.product_id,
-                                move.location_id
-                            )
-                            
-                            _logger.info(f"  - Available quantity: {available_qty} {move.product_uom.name}")
-                            
-                            if move.product_uom_qty > available_qty:
-                                error_msg = (
-                                    f'Transfer validation failed for "{move.product_id.display_name}".\n'
-                                    f'Requested: {move.product_uom_qty} {move.product_uom.name}\n'
-                                    f'Available: {available_qty} {move.product_uom.name}\n'
-                                    f'Location: {move.location_id.display_name}'
-                                )
-                                _logger.error(f"VALIDATION FAILED: {error_msg}")
-                                raise ValidationError(_(error_msg))
-                            else:
-                                _logger.info(f"  - ✓ Quantity check passed")
-                        except Exception as e:
-                            _logger.error(f"Error checking available quantity for move {move.id}: {str(e)}")
-                            raise
-                    else:
-                        _logger.warning(f"  - Skipping move with zero quantity")
-            else:
-                _logger.info(f"Skipping validation for non-outgoing transfer: {picking.picking_type_id.code}")
+        outgoing_pickings = self.filtered(lambda p: p.picking_type_id.code == 'outgoing')
+        
+        moves = outgoing_pickings.move_ids.filtered(lambda m: m.product_uom_qty > 0)
+        with self.env['stock.validation.profile']._profile('validate_quantities', moves, self):
+            # Availability of every (product, location) pair in one aggregated pass
+            available_quantities = moves._get_available_quantities()
         
-        _logger.info("--- Transfer quantity validation completed ---")
+        for move in moves:
+            available_qty = available_quantities[move.id]
+            if trace:
+                diagnostics.trace("Move %s: requested %s, available %s", move.id, move.product_uom_qty, available_qty)
+            if move.product_uom_qty > available_qty:
+                error_msg = (
+                    f'Transfer validation failed for "{move.product_id.display_name}".\n'
+                    f'Requested: {move.product_uom_qty} {move.product_uom.name}\n'
+                    f'Available: {available_qty} {move.product_uom.name}\n'
+                    f'Location: {move.location_id.display_name}'
+                )
+                raise ValidationError(_(error_msg))
     
     @api.constrains('state')
     def _check_transfer_permissions(self):
         """Check if user has permission to validate transfers"""
-        _logger.info("=== CHECKING TRANSFER PERMISSIONS ===")
+        trace = diagnostics.active(self.env, self.ids)
         
         for picking in self:
-            _logger.info(f"Checking permissions for picking: {picking.name} (State: {picking.state})")
-            
             if picking.state == 'done' and picking.picking_type_id.code == 'outgoing':
-                user = self.env.user
-                _logger.info(f"User: {user.name} (ID: {user.id})")
-                
                 # Check if user has the required group
-                has_permission = user.has_group('new_modules_customization.group_inventory_transfer_manager')
-                _logger.info(f"Has transfer manager permission: {has_permission}")
+                _unrestricted, has_permission, _excluded_location_ids = \
+                    self.env['stock.location']._get_location_access_policy()
+                if trace:
+                    diagnostics.trace("Picking %s: user %s has transfer manager permission: %s",
+                                      picking.id, self.env.uid, has_permission)
                 
                 if not has_permission:
-                    # Log user's current groups for debugging
-                    user_groups = user.groups_id.mapped('name')
-                    _logger.warning(f"User groups: {user_groups}")
-                    
                     error_msg = (
                         'You do not have permission to validate inventory transfers. '
                         'Please contact your administrator.'
                     )
-                    _logger.error(f"PERMISSION DENIED: {error_msg}")
                     raise ValidationError(_(error_msg))
-                else:
-                    _logger.info("✓ Transfer permission check passed")
-            else:
-                _logger.info(f"Permission check skipped - State: {picking.state}, Type: {picking.picking_type_id.code}")
-        
-        _logger.info("=== TRANSFER PERMISSIONS CHECK COMPLETED ===")
         
 
     def _get_internal_locations_domain(self):
-        user = self.env.user
-        unrestricted_groups = [
-            'base.group_system',  # Administrator
-            # 'stock.group_stock_manager',  # Inventory Manager
-            'new_modules_customization.group_inventory_transfer_manager'
-        ]
-        has_unrestricted_access = any(user.has_group(group) for group in unrestricted_groups)
-        _logger.info("=== DETERMINING LOCATION DOMAIN ===")
-        _logger.info("unrestricted_groups: %s", unrestricted_groups)
-        _logger.info("user: %s", user)
-        if has_unrestricted_access:
+        unrestricted, _can_validate, excluded_location_ids = \
+            self.env['stock.location']._get_location_access_policy()
+        if diagnostics.active(self.env):
+            diagnostics.trace("User %s has unrestricted access to locations: %s", self.env.uid, unrestricted)
+        if unrestricted:
         # Admin/Manager can see all locations for source
-            _logger.info("User has unrestricted access to locations")
             return []       
         else:
-            _logger.info("elseeeeUser has restricted access to locations")
             # Regular users see restricted source locations
             return [
                 ('usage', 'in', ['internal', 'view']),
-                ('name', 'not ilike', 'Partners'),
-                ('name', 'not ilike', 'Customer'),
-                ('name', 'not ilike', 'Vendor')
+                ('id', 'not in', list(excluded_location_ids)),
             ]
     
     location_dest_id = fields.Many2one(
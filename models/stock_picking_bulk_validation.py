@@ -0,0 +1,185 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+from odoo.tools.safe_eval import safe_eval
+from .utils import commit, rollback_on_error
+from collections import defaultdict
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StockPickingBulkValidation(models.Model):
+    _name = 'stock.picking.bulk.validation'
+    _description = 'Bulk Transfer Validation'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, default=lambda self: _('Bulk Validation'))
+    user_id = fields.Many2one('res.users', string='Requested By', required=True, default=lambda self: self.env.user)
+    picking_ids = fields.Many2many('stock.picking', string='Transfers')
+    domain = fields.Char(string='Transfers Domain', default='[]',
+                         help="Used to select the transfers when none are set explicitly.")
+    chunk_size = fields.Integer(string='Chunk Size', default=100, required=True,
+                                help="Number of transfers validated and committed together.")
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='draft', required=True, readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+    line_ids = fields.One2many('stock.picking.bulk.validation.line', 'job_id', string='Results', readonly=True)
+    picking_count = fields.Integer(string='Transfers', readonly=True)
+    validated_count = fields.Integer(string='Validated', readonly=True)
+    failed_count = fields.Integer(string='Failed', readonly=True)
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+
+    _sql_constraints = [
+        ('chunk_size_positive', 'CHECK(chunk_size > 0)', 'The chunk size must be positive.'),
+    ]
+
+    @api.depends('picking_count', 'validated_count', 'failed_count')
+    def _compute_progress(self):
+        for job in self:
+            processed = job.validated_count + job.failed_count
+            job.progress = 100.0 * processed / job.picking_count if job.picking_count else 0.0
+
+    def action_queue(self):
+        """Select the transfers and queue the job for the validation cron"""
+        for job in self.filtered(lambda j: j.state == 'draft'):
+            pickings = job.picking_ids or self.env['stock.picking'].search(safe_eval(job.domain or '[]'))
+            pickings = pickings.filtered(lambda p: p.state not in ('done', 'cancel'))
+            if not pickings:
+                raise UserError(_('There is no transfer to validate.'))
+            job.write({
+                'state': 'queued',
+                'picking_count': len(pickings),
+                'line_ids': [(0, 0, {'picking_id': picking.id}) for picking in pickings],
+            })
+        self.env.ref('new_modules_customization.ir_cron_bulk_picking_validation')._trigger()
+        return True
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Process queued jobs, resuming the ones interrupted while running
+
+        A job raising an error keeps the chunks committed so far and is
+        marked as failed, so that it is not resumed, and fails again, at
+        every run before the jobs queued after it.
+        """
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            try:
+                with rollback_on_error(self.env):
+                    job.with_user(job.user_id)._process()
+            except Exception as e:
+                _logger.exception("Bulk validation %s failed", job.id)
+                job.write({'state': 'failed', 'error': str(e)})
+                commit(self.env)
+
+    def _process(self):
+        """Validate the pending transfers of the job chunk by chunk"""
+        self.ensure_one()
+        self.state = 'running'
+        commit(self.env)
+
+        pending_lines = self.line_ids.filtered(lambda l: l.state == 'pending')
+        failures = self._check_availability(pending_lines.picking_id)
+        for line in pending_lines:
+            if line.picking_id.id in failures:
+                line.write({'state': 'failed', 'message': failures[line.picking_id.id]})
+        self.failed_count += len(failures)
+        commit(self.env)
+
+        for line_ids in split_every(self.chunk_size, pending_lines.filtered(lambda l: l.state == 'pending').ids):
+            lines = self.env['stock.picking.bulk.validation.line'].browse(line_ids)
+            lines._validate_pickings()
+            self.validated_count += len(lines.filtered(lambda l: l.state == 'validated'))
+            self.failed_count += len(lines.filtered(lambda l: l.state == 'failed'))
+            commit(self.env)
+            _logger.info("Bulk validation %s: %s/%s transfers processed",
+                         self.id, self.validated_count + self.failed_count, self.picking_count)
+
+        self.state = 'done'
+        commit(self.env)
+
+    def _check_availability(self, pickings):
+        """Check all outgoing transfers against one batched availability pass
+
+        Transfers consume the available quantity in order, so two transfers
+        that each fit but not together do not both pass.
+
+        :return: dict {picking id: failure message}
+        """
+        outgoing_pickings = pickings.filtered(lambda p: p.picking_type_id.code == 'outgoing')
+        moves = outgoing_pickings.move_ids.filtered(lambda m: m.product_uom_qty > 0)
+        available_quantities = moves._get_available_quantities()
+
+        moves_by_picking = defaultdict(list)
+        for move in moves:
+            moves_by_picking[move.picking_id.id].append(move)
+
+        consumed = defaultdict(float)
+        failures = {}
+        for picking in outgoing_pickings:
+            picking_moves = moves_by_picking[picking.id]
+            shortages = [
+                move for move in picking_moves
+                if consumed[move._get_availability_key()] + move.product_uom_qty > available_quantities[move.id]
+            ]
+            if shortages:
+                failures[picking.id] = _('Insufficient quantity for: %s') % ', '.join(
+                    move.product_id.display_name for move in shortages
+                )
+                continue
+            for move in picking_moves:
+                consumed[move._get_availability_key()] += move.product_uom_qty
+        return failures
+
+
+class StockPickingBulkValidationLine(models.Model):
+    _name = 'stock.picking.bulk.validation.line'
+    _description = 'Bulk Transfer Validation Result'
+    _order = 'id'
+
+    job_id = fields.Many2one('stock.picking.bulk.validation', string='Job', required=True, index=True, ondelete='cascade')
+    picking_id = fields.Many2one('stock.picking', string='Transfer', required=True, ondelete='cascade')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('validated', 'Validated'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True)
+    message = fields.Text(string='Message')
+
+    def _validate_pickings(self):
+        """Validate the transfers of the lines, isolating failing ones
+
+        The whole chunk is validated at once; when that fails, each transfer
+        is retried on its own so that one failure does not block the others.
+        Validations stay in the job transaction: a transfer committed on a
+        fresh snapshot would make the transfers validated after it read the
+        stock of the older job snapshot.
+        """
+        pickings = self.picking_id.with_context(skip_backorder=True, skip_sms=True, validate_on_fresh_snapshot=False)
+        try:
+            with self.env.cr.savepoint():
+                result = pickings.button_validate()
+            if result is True:
+                self.write({'state': 'validated'})
+                return
+        except Exception as e:
+            _logger.info("Bulk validation of %s transfers failed, retrying one by one: %s", len(pickings), e)
+
+        for line in self:
+            if line.picking_id.state == 'done':
+                line.write({'state': 'validated'})
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    result = line.picking_id.with_env(pickings.env).button_validate()
+                if result is True:
+                    line.write({'state': 'validated'})
+                else:
+                    line.write({'state': 'failed', 'message': _('The transfer requires a manual validation.')})
+            except Exception as e:
+                line.write({'state': 'failed', 'message': str(e)})
@@ -0,0 +1,14 @@
+from odoo import fields, models
+
+
+class StockPickingType(models.Model):
+    _inherit = 'stock.picking.type'
+
+    availability_mode = fields.Selection([
+        ('on_hand', 'On Hand'),
+        ('projected', 'Projected'),
+    ], string='Availability Check', default='on_hand', required=True,
+        help="Quantity used when validating transfers of this type.\n"
+             "On Hand: quantity currently in the source location.\n"
+             "Projected: on hand quantity minus the quantities reserved or "
+             "pending in other outgoing transfers.")
@@ -0,0 +1,47 @@
+from odoo import api, models
+from collections import defaultdict
+
+
+# Fields of stock.quant feeding the availability ledger
+AVAILABILITY_QUANT_FIELDS = {'product_id', 'location_id', 'quantity', 'reserved_quantity'}
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        quants = super().create(vals_list)
+        quants._update_availability_ledger(sign=1)
+        self.env['stock.move']._invalidate_availability_cache(quants._get_availability_keys())
+        return quants
+
+    def write(self, vals):
+        track_ledger = bool(AVAILABILITY_QUANT_FIELDS.intersection(vals))
+        if track_ledger:
+            keys = self._get_availability_keys()
+            self._update_availability_ledger(sign=-1)
+        result = super().write(vals)
+        if track_ledger:
+            self._update_availability_ledger(sign=1)
+            self.env['stock.move']._invalidate_availability_cache(keys | self._get_availability_keys())
+        return result
+
+    def unlink(self):
+        self._update_availability_ledger(sign=-1)
+        self.env['stock.move']._invalidate_availability_cache(self._get_availability_keys())
+        return super().unlink()
+
+    def _get_availability_keys(self):
+        """Return the set of (product_id, location_id) pairs of the quants"""
+        return {(quant.product_id.id, quant.location_id.id) for quant in self}
+
+    def _update_availability_ledger(self, sign):
+        """Add (sign=1) or remove (sign=-1) the quantities of the quants to
+        the availability ledger"""
+        deltas = defaultdict(lambda: [0.0, 0.0])
+        for quant in self:
+            delta = deltas[quant.product_id.id, quant.location_id.id]
+            delta[0] += sign * quant.quantity
+            delta[1] += sign * quant.reserved_quantity
+        self.env['stock.availability.ledger']._apply_deltas(deltas)
@@ -0,0 +1,358 @@
+from odoo import api, fields, models, _
+from odoo.tools import split_every
+from .stock_availability_ledger import LEDGER_TOTALS_QUERY
+from .stock_move import PENDING_MOVE_STATES, PENDING_OUT_QUERY, get_own_quantity
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+import logging
+import math
+import os
+import time
+
+_logger = logging.getLogger(__name__)
+
+# States of the outgoing moves still to be validated
+OPEN_MOVE_STATES = ('waiting', 'confirmed', 'partially_available', 'assigned')
+
+# Changes written by transactions still running when the previous report
+# started may carry an older write_date; look back that far before it
+SHORTFALL_CHANGE_MARGIN = timedelta(minutes=15)
+
+# Partitions per worker, smaller partitions even out the worker loads
+PARTITIONS_PER_WORKER = 4
+
+
+def _compute_partition(registry, partition):
+    """Compute the shortfall lines of a partition of (product, location)
+    keys in a dedicated read-only transaction
+
+    Runs in the worker threads, so it must only use its own cursor and the
+    plain data of ``partition``.
+    """
+    with registry.cursor() as cr:
+        cr.execute("SET TRANSACTION READ ONLY")
+        return _compute_shortfalls(cr, partition)
+
+
+def _compute_shortfalls(cr, partition):
+    """Apply the availability rules of ``stock.move`` to every open outgoing
+    move of the partition keys
+
+    Moves of projected picking types are checked against the on hand
+    quantity minus the reserved and pending quantities of the other moves.
+    The other moves consume the on hand quantity in scheduled order, as the
+    bulk validation does, so that two moves that each fit but not together
+    are not both reported as valid.
+
+    :param partition: dict with the ``keys``, the ``descendant_ids`` of
+        their locations and the ``outgoing_type_ids`` and
+        ``projected_type_ids`` of the picking types
+    :return: list of line values tuples (move_id, picking_id, product_id,
+        location_id, requested_qty, available_qty)
+    """
+    keys = partition['keys']
+    root_ids, member_ids = [], []
+    for root_id in {location_id for _product_id, location_id in keys}:
+        descendant_ids = partition['descendant_ids'][root_id]
+        root_ids.extend([root_id] * len(descendant_ids))
+        member_ids.extend(descendant_ids)
+    product_ids = list({product_id for product_id, _location_id in keys})
+    cr.execute(LEDGER_TOTALS_QUERY, {
+        'root_ids': root_ids,
+        'member_ids': member_ids,
+        'product_ids': product_ids,
+    })
+    totals = {(row[0], row[1]): row[2:] for row in cr.fetchall()}
+    cr.execute(PENDING_OUT_QUERY, {
+        'root_ids': root_ids,
+        'member_ids': member_ids,
+        'outgoing_type_ids': partition['outgoing_type_ids'],
+        'product_ids': product_ids,
+        'states': PENDING_MOVE_STATES,
+    })
+    pending_out = {(row[0], row[1]): row[2] for row in cr.fetchall()}
+
+    cr.execute("""
+        SELECT move.id, move.picking_id, move.product_id, move.location_id, move.picking_type_id,
+               move.state, move.product_uom_qty, move.quantity
+          FROM unnest(%(product_ids)s::int[], %(location_ids)s::int[]) AS key(product_id, location_id)
+          JOIN stock_move AS move
+            ON move.product_id = key.product_id AND move.location_id = key.location_id
+          LEFT JOIN stock_picking AS picking ON picking.id = move.picking_id
+         WHERE move.picking_type_id = ANY(%(outgoing_type_ids)s)
+           AND move.state IN %(states)s
+           AND move.product_uom_qty > 0
+         ORDER BY picking.scheduled_date, move.picking_id, move.id
+    """, {
+        'product_ids': [key[0] for key in keys],
+        'location_ids': [key[1] for key in keys],
+        'outgoing_type_ids': partition['outgoing_type_ids'],
+        'states': OPEN_MOVE_STATES,
+    })
+
+    projected_type_ids = set(partition['projected_type_ids'])
+    consumed = defaultdict(float)
+    lines = []
+    for move_id, picking_id, product_id, location_id, type_id, state, demand, quantity in cr.fetchall():
+        key = (product_id, location_id)
+        on_hand, reserved = totals.get(key, (0.0, 0.0))
+        pending = pending_out.get(key, 0.0)
+        if type_id in projected_type_ids:
+            available = on_hand - (reserved + pending - get_own_quantity(state, demand, quantity))
+        else:
+            available = on_hand - consumed[key]
+            if demand <= available:
+                consumed[key] += demand
+        if demand > available:
+            lines.append((move_id, picking_id, product_id, location_id, demand, available))
+    return lines
+
+
+class StockShortfallReport(models.Model):
+    _name = 'stock.shortfall.report'
+    _description = 'Stock Shortfall Report'
+    _order = 'date desc, id desc'
+
+    name = fields.Char(string='Name', required=True, readonly=True)
+    date = fields.Datetime(string='Date', required=True, readonly=True)
+    incremental = fields.Boolean(string='Incremental', readonly=True)
+    previous_report_id = fields.Many2one('stock.shortfall.report', string='Based On', readonly=True,
+                                         ondelete='set null')
+    line_ids = fields.One2many('stock.shortfall.report.line', 'report_id', string='Shortfalls', readonly=True)
+    key_count = fields.Integer(string='Product/Location Pairs', readonly=True)
+    computed_key_count = fields.Integer(string='Recomputed Pairs', readonly=True)
+    line_count = fields.Integer(string='Short Moves', readonly=True)
+    picking_count = fields.Integer(string='Short Transfers', readonly=True)
+    product_count = fields.Integer(string='Short Products', readonly=True)
+    duration = fields.Float(string='Duration (s)', readonly=True)
+
+    @api.model
+    def action_generate(self):
+        """Generate a report, only recomputing the pairs changed since the
+        previous one"""
+        return self._generate()._get_action()
+
+    @api.model
+    def action_generate_full(self):
+        """Generate a report recomputing every pair"""
+        return self._generate(incremental=False)._get_action()
+
+    def _get_action(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'stock.shortfall.report',
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    @api.model
+    def _cron_generate(self):
+        """Generate the daily report and delete the reports older than
+        ``new_modules_customization.shortfall_retention_days`` (30 by
+        default), always keeping the latest one"""
+        report = self._generate()
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'new_modules_customization.shortfall_retention_days', 30))
+        self.search([
+            ('date', '<', fields.Datetime.now() - timedelta(days=retention_days)),
+            ('id', '!=', report.id),
+        ]).unlink()
+
+    @api.model
+    def _generate(self, incremental=True):
+        """Compute the shortfalls of every open outgoing move
+
+        The (product, location) pairs of the moves are partitioned and
+        computed in a pool of ``new_modules_customization.shortfall_workers``
+        threads (up to 4 by default), each on its own cursor of the registry.
+        An incremental report copies the lines of the previous report for
+        the pairs whose moves and ledger rows did not change since it ran.
+
+        Workers read the committed data, each in its own snapshot.
+        """
+        start = time.time()
+        self.env.flush_all()
+        date = self.env.cr.now()
+
+        outgoing_types = self.env['stock.picking.type'].with_context(active_test=False).search([
+            ('code', '=', 'outgoing'),
+        ])
+        keys = {
+            (product.id, location.id)
+            for product, location in self.env['stock.move']._read_group(
+                [
+                    ('picking_type_id', 'in', outgoing_types.ids),
+                    ('state', 'in', OPEN_MOVE_STATES),
+                    ('product_uom_qty', '>', 0),
+                ],
+                ['product_id', 'location_id'],
+            )
+        }
+
+        previous = self.search([], limit=1) if incremental else self.browse()
+        if previous:
+            changed_keys = self._get_changed_keys(previous.date - SHORTFALL_CHANGE_MARGIN)
+            compute_keys = keys & changed_keys
+        else:
+            changed_keys, compute_keys = set(), keys
+
+        report = self.create({
+            'name': _('Shortfalls of %s', fields.Datetime.to_string(date)),
+            'date': date,
+            'incremental': bool(previous),
+            'previous_report_id': previous.id,
+            'key_count': len(keys),
+            'computed_key_count': len(compute_keys),
+        })
+        if previous:
+            report._copy_lines(previous, changed_keys)
+        report._insert_lines(self._compute_lines(
+            sorted(compute_keys),
+            outgoing_types.ids,
+            outgoing_types.filtered(lambda t: t.availability_mode == 'projected').ids,
+        ))
+
+        self.env.cr.execute("""
+            SELECT COUNT(*), COUNT(DISTINCT picking_id), COUNT(DISTINCT product_id)
+              FROM stock_shortfall_report_line
+             WHERE report_id = %s
+        """, [report.id])
+        line_count, picking_count, product_count = self.env.cr.fetchone()
+        report.write({
+            'line_count': line_count,
+            'picking_count': picking_count,
+            'product_count': product_count,
+            'duration': time.time() - start,
+        })
+        _logger.info("Shortfall report %s: %s short moves, %s/%s pairs computed in %.2fs",
+                     report.id, line_count, len(compute_keys), len(keys), report.duration)
+        return report
+
+    @api.model
+    def _get_changed_keys(self, since):
+        """Return the (product_id, location_id) pairs whose moves or ledger
+        rows were written since ``since``
+
+        A ledger row changes the availability of its location and of all the
+        parent locations.
+        """
+        self.env.cr.execute("""
+            SELECT DISTINCT product_id, location_id FROM stock_move WHERE write_date >= %(since)s
+        """, {'since': since})
+        changed_keys = set(self.env.cr.fetchall())
+        self.env.cr.execute("""
+            SELECT DISTINCT product_id, location_id FROM stock_availability_ledger WHERE write_date >= %(since)s
+        """, {'since': since})
+        ledger_keys = self.env.cr.fetchall()
+        locations = self.env['stock.location'].browse({location_id for _product_id, location_id in ledger_keys})
+        ancestor_ids = {location.id: location._get_ancestor_ids() for location in locations}
+        for product_id, location_id in ledger_keys:
+            changed_keys.update((product_id, ancestor_id) for ancestor_id in ancestor_ids[location_id])
+        return changed_keys
+
+    @api.model
+    def _compute_lines(self, keys, outgoing_type_ids, projected_type_ids):
+        """Compute the shortfall lines of the keys, in parallel when there is
+        more than one worker"""
+        if not keys:
+            return []
+        workers = int(self.env['ir.config_parameter'].sudo().get_param(
+            'new_modules_customization.shortfall_workers', min(4, os.cpu_count() or 1)))
+        Location = self.env['stock.location']
+        partitions = []
+        partition_size = math.ceil(len(keys) / (max(workers, 1) * PARTITIONS_PER_WORKER))
+        for partition_keys in split_every(partition_size, keys, list):
+            partitions.append({
+                'keys': partition_keys,
+                'descendant_ids': {
+                    location_id: Location._get_descendant_ids(location_id)
+                    for location_id in {location_id for _product_id, location_id in partition_keys}
+                },
+                'outgoing_type_ids': outgoing_type_ids,
+                'projected_type_ids': projected_type_ids,
+            })
+
+        compute_partition = partial(_compute_partition, self.env.registry)
+        if workers <= 1:
+            results = map(compute_partition, partitions)
+            return [line for lines in results for line in lines]
+        # The workers mostly wait for their queries, which release the GIL
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(compute_partition, partitions)
+            return [line for lines in results for line in lines]
+
+    def _insert_lines(self, lines):
+        """Insert the computed lines with one multi-row insert"""
+        self.ensure_one()
+        if not lines:
+            return
+        columns = list(zip(*lines))
+        self.env.cr.execute("""
+            INSERT INTO stock_shortfall_report_line
+                (report_id, move_id, picking_id, product_id, location_id,
+                 requested_qty, available_qty, shortfall_qty)
+            SELECT %(report_id)s, line.move_id, line.picking_id, line.product_id, line.location_id,
+                   line.requested_qty, line.available_qty, line.requested_qty - line.available_qty
+              FROM unnest(%(move_ids)s::int[], %(picking_ids)s::int[], %(product_ids)s::int[],
+                          %(location_ids)s::int[], %(requested_qties)s::float8[], %(available_qties)s::float8[])
+                   AS line(move_id, picking_id, product_id, location_id, requested_qty, available_qty)
+        """, {
+            'report_id': self.id,
+            'move_ids': list(columns[0]),
+            'picking_ids': list(columns[1]),
+            'product_ids': list(columns[2]),
+            'location_ids': list(columns[3]),
+            'requested_qties': list(columns[4]),
+            'available_qties': list(columns[5]),
+        })
+        self.invalidate_recordset(['line_ids'])
+
+    def _copy_lines(self, previous, changed_keys):
+        """Copy the lines of ``previous`` whose pair did not change"""
+        self.ensure_one()
+        changed_keys = sorted(changed_keys)
+        self.env.cr.execute("""
+            INSERT INTO stock_shortfall_report_line
+                (report_id, move_id, picking_id, product_id, location_id,
+                 requested_qty, available_qty, shortfall_qty)
+            SELECT %(report_id)s, line.move_id, line.picking_id, line.product_id, line.location_id,
+                   line.requested_qty, line.available_qty, line.shortfall_qty
+              FROM stock_shortfall_report_line AS line
+             WHERE line.report_id = %(previous_id)s
+               AND line.move_id IS NOT NULL
+               AND NOT EXISTS (
+                   SELECT 1
+                     FROM unnest(%(product_ids)s::int[], %(location_ids)s::int[]) AS changed(product_id, location_id)
+                    WHERE changed.product_id = line.product_id AND changed.location_id = line.location_id
+               )
+        """, {
+            'report_id': self.id,
+            'previous_id': previous.id,
+            'product_ids': [key[0] for key in changed_keys],
+            'location_ids': [key[1] for key in changed_keys],
+        })
+        self.invalidate_recordset(['line_ids'])
+
+
+class StockShortfallReportLine(models.Model):
+    _name = 'stock.shortfall.report.line'
+    _description = 'Stock Shortfall Report Line'
+    _order = 'report_id, picking_id, product_id'
+    _log_access = False
+
+    report_id = fields.Many2one('stock.shortfall.report', string='Report', required=True, readonly=True,
+                                index=True, ondelete='cascade')
+    move_id = fields.Many2one('stock.move', string='Move', readonly=True, ondelete='set null')
+    picking_id = fields.Many2one('stock.picking', string='Transfer', readonly=True, ondelete='set null')
+    product_id = fields.Many2one('product.product', string='Product', required=True, readonly=True,
+                                 ondelete='cascade')
+    location_id = fields.Many2one('stock.location', string='Source Location', required=True, readonly=True,
+                                  ondelete='cascade')
+    requested_qty = fields.Float(string='Requested Quantity', readonly=True, digits='Product Unit of Measure')
+    available_qty = fields.Float(string='Available Quantity', readonly=True, digits='Product Unit of Measure',
+                                 group_operator=False)
+    shortfall_qty = fields.Float(string='Shortfall', readonly=True, digits='Product Unit of Measure')
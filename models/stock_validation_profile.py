@@ -0,0 +1,137 @@
+from odoo import api, fields, models, tools
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+OPERATIONS = [
+    ('button_validate', 'Validate Transfer'),
+    ('validate_quantities', 'Check Quantities'),
+    ('action_confirm', 'Confirm Moves'),
+    ('action_assign', 'Reserve Moves'),
+    ('action_done', 'Complete Moves'),
+]
+
+
+class StockValidationProfile(models.Model):
+    _name = 'stock.validation.profile'
+    _description = 'Transfer Validation Profile'
+    _order = 'id desc'
+
+    operation = fields.Selection(OPERATIONS, string='Operation', required=True, readonly=True)
+    picking_type_id = fields.Many2one('stock.picking.type', string='Operation Type', readonly=True, index=True)
+    picking_id = fields.Many2one('stock.picking', string='Transfer', readonly=True, ondelete='set null')
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+    move_count = fields.Integer(string='Moves', readonly=True)
+    key_count = fields.Integer(string='Product/Location Pairs', readonly=True)
+    wall_time = fields.Float(string='Wall Time (ms)', readonly=True, group_operator='avg')
+    query_count = fields.Integer(string='Queries', readonly=True, group_operator='avg')
+    query_time = fields.Float(string='Query Time (ms)', readonly=True, group_operator='avg')
+    lock_wait = fields.Float(string='Lock Wait (ms)', readonly=True, group_operator='avg')
+    failed = fields.Boolean(string='Failed', readonly=True)
+
+    @api.model
+    def _is_enabled(self):
+        return bool(self.env['ir.config_parameter'].sudo().get_param(
+            'new_modules_customization.validation_profiling'))
+
+    @contextmanager
+    def _profile(self, operation, moves, pickings=None):
+        """Measure the enclosed block and store the result when profiling is
+        enabled with the ``new_modules_customization.validation_profiling``
+        system parameter
+
+        Yields a dict in which the block may report extra measures
+        (``lock_wait``, in seconds).
+        """
+        stats = {}
+        if not self._is_enabled():
+            yield stats
+            return
+
+        # Read before measuring: the transaction may be unusable afterwards
+        vals = {
+            'operation': operation,
+            'picking_type_id': (pickings or moves).picking_type_id[:1].id,
+            'picking_id': pickings.id if pickings and len(pickings) == 1 else False,
+            'user_id': self.env.uid,
+            'move_count': len(moves),
+            'key_count': len(moves._get_availability_keys()),
+        }
+        cr = self.env.cr
+        thread = threading.current_thread()
+        start_query_count = cr.sql_log_count
+        start_query_time = getattr(thread, 'query_time', 0.0)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield stats
+        except Exception:
+            failed = True
+            raise
+        finally:
+            vals.update({
+                'wall_time': (time.perf_counter() - start) * 1000,
+                'query_count': cr.sql_log_count - start_query_count,
+                'query_time': (getattr(thread, 'query_time', 0.0) - start_query_time) * 1000,
+                'lock_wait': stats.get('lock_wait', 0.0) * 1000,
+                'failed': failed,
+            })
+            self._store(vals)
+
+    @api.model
+    def _store(self, vals):
+        """Store a profile, in its own transaction when the current one is
+        going to be rolled back"""
+        try:
+            if not vals['failed']:
+                self.sudo().create(vals)
+                return
+            with self.env.registry.cursor() as cr:
+                vals['picking_id'] = False
+                self.with_env(self.env(cr=cr, su=True)).create(vals)
+        except Exception as e:
+            _logger.warning("Could not store validation profile: %s", e)
+
+
+class StockValidationProfileReport(models.Model):
+    _name = 'stock.validation.profile.report'
+    _description = 'Transfer Validation Latency Analysis'
+    _auto = False
+    _order = 'picking_type_id, operation'
+
+    operation = fields.Selection(OPERATIONS, string='Operation', readonly=True)
+    picking_type_id = fields.Many2one('stock.picking.type', string='Operation Type', readonly=True)
+    count = fields.Integer(string='Runs', readonly=True)
+    wall_time_avg = fields.Float(string='Average (ms)', readonly=True)
+    wall_time_p50 = fields.Float(string='p50 (ms)', readonly=True)
+    wall_time_p95 = fields.Float(string='p95 (ms)', readonly=True)
+    query_count_p50 = fields.Float(string='Queries p50', readonly=True)
+    query_count_p95 = fields.Float(string='Queries p95', readonly=True)
+    query_time_p95 = fields.Float(string='Query Time p95 (ms)', readonly=True)
+    lock_wait_p95 = fields.Float(string='Lock Wait p95 (ms)', readonly=True)
+    move_count_avg = fields.Float(string='Average Moves', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT row_number() OVER (ORDER BY picking_type_id, operation) AS id,
+                       operation,
+                       picking_type_id,
+                       count(*) AS count,
+                       avg(wall_time) AS wall_time_avg,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY wall_time) AS wall_time_p50,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY wall_time) AS wall_time_p95,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY query_count) AS query_count_p50,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY query_count) AS query_count_p95,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY query_time) AS query_time_p95,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY lock_wait) AS lock_wait_p95,
+                       avg(move_count) AS move_count_avg
+                  FROM stock_validation_profile
+                 WHERE NOT failed
+                 GROUP BY operation, picking_type_id
+            )
+        """)
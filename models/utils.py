@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+import threading
+
+
+def is_testing():
+    """Whether the current thread runs tests, which run in a single
+    transaction that must not be committed"""
+    return getattr(threading.current_thread(), 'testing', False)
+
+
+def commit(env):
+    """Commit the transaction of ``env``, except in tests"""
+    if not is_testing():
+        env.cr.commit()
+
+
+@contextmanager
+def rollback_on_error(env):
+    """Roll back the uncommitted changes of the block when it raises, and
+    let the error propagate
+
+    The block may commit with ``commit``. In tests, where ``commit`` does
+    nothing, the block runs in a savepoint instead.
+    """
+    if is_testing():
+        with env.cr.savepoint():
+            yield
+        return
+    try:
+        yield
+    except Exception:
+        env.cr.rollback()
+        raise
@@ -3,17 +3,39 @@
 // File: static/src/js/pos_customer_display.js
 
 import { PaymentScreen } from "@point_of_sale/app/screens/payment_screen/payment_screen";
+import { PosStore } from "@point_of_sale/app/store/pos_store";
 import { patch } from "@web/core/utils/patch";
-import { useState, onMounted } from "@odoo/owl";
+import { useState, onMounted, onWillUnmount } from "@odoo/owl";
+import { getSubscriberStore } from "@new_modules_customization/js/subscriber_store";
+
+patch(PosStore.prototype, {
+    async _processData(loadedData) {
+        await super._processData(...arguments);
+        this.subscriberChannel = loadedData.subscriber_channel;
+    },
+});
 
 patch(PaymentScreen.prototype, {
     setup() {
         super.setup();
         this.customerInfo = useState({ data: null, loading: false });
+        this.subscriberStore = getSubscriberStore(
+            this.env.services.orm,
+            this.pos.pos_session.id,
+            this.pos.config.id
+        );
+        // Balance and status changes are pushed by the server
+        this.subscriberStore.listen(this.env.services.bus_service, this.pos.subscriberChannel);
+        const stopListening = this.subscriberStore.onUpdate((partners) => this.onSubscriberUpdate(partners));
+        onWillUnmount(stopListening);
         
         // Load customer info when screen loads
         onMounted(() => {
             this.loadCustomerInfo();
+            // Refresh the offline cache in the background
+            this.subscriberStore.sync().catch((error) => {
+                console.log('Subscriber cache sync failed:', error);
+            });
         });
     },
 
@@ -24,33 +46,33 @@ patch(PaymentScreen.prototype, {
             return;
         }
 
+        // Offline cache first, then the partners loaded with the session
+        const cached = await this.subscriberStore.get(partner.id);
+        if (cached) {
+            this.customerInfo.data = this.buildCustomerInfo(cached);
+            return;
+        }
+        if (this.hasSubscriberData(partner)) {
+            this.customerInfo.data = this.buildCustomerInfo(partner);
+            return;
+        }
+
         this.customerInfo.loading = true;
         
         try {
-            // Load additional customer data
-            const result = await this.env.services.orm.read(
-                "res.partner",
-                [partner.id],
-                [
-                    'name', 'phone', 'mobile', 'family_number', 
-                    'total_due', 'number_of_expired_days', 'status',
-                    'category_id', 'area_name_id'
-                ]
+            // Fallback for partners loaded without the subscription data
+            const result = await this.env.services.orm.call(
+                "pos.session",
+                "get_subscriber_info",
+                [[this.pos.pos_session.id], [partner.id]]
             );
 
             if (result && result.length > 0) {
-                const data = result[0];
-                this.customerInfo.data = {
-                    name: data.name || 'غير محدد',
-                    phone: data.phone || '',
-                    mobile: data.mobile || '',
-                    family_number: data.family_number || '',
-                    balance: data.total_due || 0,
-                    remaining_days: data.number_of_expired_days || 0,
-                    status: data.status || 'active',
-                    region: this.getAreaName(data.area_name_id),
-                    categories: this.getCategories(data.category_id)
-                };
+                // Keep the data on the partner and in the offline cache so the
+                // next display needs no RPC
+                Object.assign(partner, result[0]);
+                this.subscriberStore.put(result).catch(() => {});
+                this.customerInfo.data = this.buildCustomerInfo(partner);
             }
         } catch (error) {
             console.log('Error loading customer info:', error);
@@ -71,6 +93,38 @@ patch(PaymentScreen.prototype, {
         this.customerInfo.loading = false;
     },
 
+    onSubscriberUpdate(partners) {
+        const current = this.currentOrder.get_partner();
+        for (const values of partners) {
+            const partner = this.pos.db.get_partner_by_id(values.id);
+            if (partner) {
+                Object.assign(partner, values);
+            }
+            if (current && current.id === values.id && this.customerInfo.data) {
+                // Patch the displayed info in place
+                Object.assign(this.customerInfo.data, this.buildCustomerInfo(Object.assign({}, current, values)));
+            }
+        }
+    },
+
+    hasSubscriberData(partner) {
+        return 'total_due' in partner || 'subscriber_categories' in partner;
+    },
+
+    buildCustomerInfo(data) {
+        return {
+            name: data.name || 'غير محدد',
+            phone: data.phone || '',
+            mobile: data.mobile || '',
+            family_number: data.family_number || '',
+            balance: data.total_due || 0,
+            remaining_days: data.number_of_expired_days || 0,
+            status: data.status || 'active',
+            region: this.getAreaName(data.area_name_id),
+            categories: data.subscriber_categories || this.getCategories(data.category_id)
+        };
+    },
+
     getAreaName(area) {
         if (!area) return '';
         if (Array.isArray(area) && area.length > 1) return area[1];
@@ -0,0 +1,169 @@
+/** @odoo-module */
+// Offline subscriber cache for the POS customer display
+// File: static/src/js/subscriber_store.js
+
+const DB_VERSION = 1;
+const PARTNERS = "partners";
+const META = "meta";
+
+/**
+ * IndexedDB store of subscriber display data.
+ *
+ * Filled on first use with a full load, then kept up to date by fetching only
+ * the partners whose write_date changed since the last sync token. Reads are
+ * served locally, so the payment screen keeps working during network drops.
+ */
+export class SubscriberStore {
+    constructor(orm, sessionId, dbName) {
+        this.orm = orm;
+        this.sessionId = sessionId;
+        this.dbName = dbName;
+        this.dbPromise = null;
+        this.syncPromise = null;
+        this.listening = false;
+        this.listeners = new Set();
+    }
+
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(this.dbName, DB_VERSION);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    db.createObjectStore(PARTNERS, { keyPath: "id" });
+                    db.createObjectStore(META);
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.dbPromise;
+    }
+
+    async _run(storeName, mode, callback) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const transaction = db.transaction(storeName, mode);
+            const result = callback(transaction.objectStore(storeName));
+            transaction.oncomplete = () => resolve(result && result.result);
+            transaction.onerror = () => reject(transaction.error);
+        });
+    }
+
+    async get(partnerId) {
+        try {
+            return await this._run(PARTNERS, "readonly", (store) => store.get(partnerId));
+        } catch (error) {
+            console.log("Subscriber cache unavailable:", error);
+            return undefined;
+        }
+    }
+
+    async put(partners) {
+        await this._run(PARTNERS, "readwrite", (store) => {
+            for (const partner of partners) {
+                if (partner.active === false) {
+                    store.delete(partner.id);
+                } else {
+                    store.put(partner);
+                }
+            }
+        });
+    }
+
+    /**
+     * Merge partial partner values into the cached partners, ignoring
+     * partners that are not cached yet.
+     */
+    async patch(partners) {
+        await this._run(PARTNERS, "readwrite", (store) => {
+            for (const values of partners) {
+                if (values.active === false) {
+                    store.delete(values.id);
+                    continue;
+                }
+                const request = store.get(values.id);
+                request.onsuccess = () => {
+                    if (request.result) {
+                        store.put(Object.assign(request.result, values));
+                    }
+                };
+            }
+        });
+    }
+
+    /**
+     * Listen to the subscriber updates published on the bus channel of the
+     * shop. Only the first call subscribes.
+     */
+    listen(busService, channel) {
+        if (this.listening || !channel) {
+            return;
+        }
+        this.listening = true;
+        busService.addChannel(channel);
+        busService.subscribe("new_modules_customization.subscriber_update", async ({ partners }) => {
+            try {
+                await this.patch(partners);
+            } catch (error) {
+                console.log("Subscriber cache update failed:", error);
+            }
+            for (const listener of this.listeners) {
+                listener(partners);
+            }
+        });
+    }
+
+    /**
+     * Register a callback receiving the updated partner values.
+     * Returns a function removing it.
+     */
+    onUpdate(callback) {
+        this.listeners.add(callback);
+        return () => this.listeners.delete(callback);
+    }
+
+    /**
+     * Fetch the changes since the last sync token, one page at a time.
+     * Concurrent calls share the same synchronisation.
+     */
+    sync() {
+        if (!this.syncPromise) {
+            this.syncPromise = this._sync().finally(() => {
+                this.syncPromise = null;
+            });
+        }
+        return this.syncPromise;
+    }
+
+    async _sync() {
+        let token = await this._run(META, "readonly", (store) => store.get("sync_token"));
+        let done = false;
+        while (!done) {
+            const result = await this.orm.call(
+                "pos.session",
+                "get_subscriber_changes",
+                [[this.sessionId], token || false]
+            );
+            await this.put(result.partners);
+            token = result.sync_token;
+            await this._run(META, "readwrite", (store) => store.put(token, "sync_token"));
+            done = result.done;
+        }
+    }
+}
+
+const stores = new Map();
+
+/**
+ * Return the subscriber store of a POS session, shared by all screens.
+ */
+export function getSubscriberStore(orm, sessionId, configId) {
+    if (!stores.has(sessionId)) {
+        stores.set(
+            sessionId,
+            new SubscriberStore(orm, sessionId, `new_modules_customization_subscribers_${configId}`)
+        );
+    }
+    return stores.get(sessionId);
+}
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+from . import test_subscriber_sync
+from . import test_available_quantity
+from . import test_location_tree
+from . import test_validation_concurrency
+from . import test_bulk_validation
+from . import test_tracking_compaction
+from . import test_validation_benchmark
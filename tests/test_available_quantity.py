@@ -0,0 +1,50 @@
+from odoo import Command
+from odoo.exceptions import ValidationError
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestAvailableQuantity(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock_location = cls.warehouse.lot_stock_id
+        cls.customer_location = cls.env.ref('stock.stock_location_customers')
+        cls.out_type = cls.warehouse.out_type_id
+        cls.out_type.availability_mode = 'projected'
+        cls.product = cls.env['product.product'].create({'name': 'Projected Product', 'type': 'product'})
+        cls.env['stock.quant']._update_available_quantity(cls.product, cls.stock_location, 8.0)
+
+    def _create_picking(self, quantity):
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': self.out_type.id,
+            'location_id': self.stock_location.id,
+            'location_dest_id': self.customer_location.id,
+            'move_ids': [Command.create({
+                'name': self.product.display_name,
+                'product_id': self.product.id,
+                'product_uom': self.product.uom_id.id,
+                'product_uom_qty': quantity,
+                'location_id': self.stock_location.id,
+                'location_dest_id': self.customer_location.id,
+            })],
+        })
+        picking.action_confirm()
+        return picking
+
+    def test_moves_checked_together_compete(self):
+        """Two moves of 5 checked at once do not both fit in 8 on hand"""
+        moves = self._create_picking(5.0).move_ids | self._create_picking(5.0).move_ids
+        with self.assertRaises(ValidationError):
+            moves._check_available_quantity()
+
+    def test_reservation_counted_once(self):
+        """A reserved outgoing move only consumes its reservation once"""
+        picking = self._create_picking(5.0)
+        picking.action_assign()
+        self.assertEqual(picking.move_ids.quantity, 5.0)
+        other_moves = self._create_picking(3.0).move_ids
+        other_moves._check_available_quantity()
+        self.assertEqual(other_moves._get_available_quantities()[other_moves.id], 3.0)
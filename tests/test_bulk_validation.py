@@ -0,0 +1,39 @@
+from odoo.tests import TransactionCase, tagged
+from unittest.mock import patch
+
+
+@tagged('post_install', '-at_install')
+class TestBulkValidation(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.pickings = cls.env['stock.picking'].create([{
+            'picking_type_id': warehouse.out_type_id.id,
+            'location_id': warehouse.lot_stock_id.id,
+            'location_dest_id': cls.env.ref('stock.stock_location_customers').id,
+        } for _index in range(2)])
+        cls.jobs = cls.env['stock.picking.bulk.validation'].create([
+            {'picking_ids': [(6, 0, picking.ids)]} for picking in cls.pickings
+        ])
+        cls.jobs.action_queue()
+
+    def test_failing_job_does_not_block_queue(self):
+        """A job raising an error is marked as failed and the next jobs are
+        processed"""
+        Job = self.env['stock.picking.bulk.validation']
+        failing_job, next_job = self.jobs
+        process = type(Job)._process
+
+        def _process(job):
+            if job == failing_job:
+                job.state = 'running'
+                raise ValueError("Lost connection")
+            return process(job)
+
+        with patch.object(type(Job), '_process', _process):
+            Job._cron_process_jobs()
+        self.assertEqual(failing_job.state, 'failed')
+        self.assertEqual(failing_job.error, "Lost connection")
+        self.assertEqual(next_job.state, 'done')
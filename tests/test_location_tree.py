@@ -0,0 +1,24 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestLocationTree(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = cls.env['stock.location'].create({'name': 'Tree Parent', 'usage': 'internal'})
+
+    def test_subtree_follows_tree_changes(self):
+        """Cached subtrees are retired by the changes of the transaction
+        without clearing the registry caches"""
+        Location = self.env['stock.location']
+        self.assertEqual(Location._get_descendant_ids(self.parent.id), (self.parent.id,))
+        version = Location._get_location_tree_version()
+
+        child = Location.create({'name': 'Tree Child', 'usage': 'internal', 'location_id': self.parent.id})
+        self.assertNotEqual(Location._get_location_tree_version(), version)
+        self.assertEqual(set(Location._get_descendant_ids(self.parent.id)), {self.parent.id, child.id})
+
+        child.location_id = False
+        self.assertEqual(Location._get_descendant_ids(self.parent.id), (self.parent.id,))
@@ -0,0 +1,55 @@
+from odoo.tests import TransactionCase, tagged
+from datetime import timedelta
+from unittest.mock import patch
+
+SHARED_WRITE_DATE = '2030-01-01 10:00:00.123456'
+
+
+@tagged('post_install', '-at_install')
+class TestSubscriberSync(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partners = cls.env['res.partner'].create([{'name': f'Subscriber {index}'} for index in range(7)])
+        cls.env.flush_all()
+        # A bulk write gives every partner the same write_date
+        cls.env.cr.execute("UPDATE res_partner SET write_date = %s WHERE id IN %s",
+                           [SHARED_WRITE_DATE, tuple(cls.partners.ids)])
+        cls.partners.invalidate_recordset()
+
+    def _sync(self, sync_token, limit):
+        """Fetch every page from ``sync_token`` and return the partner ids
+        and the final token"""
+        Session = self.env['pos.session']
+        partner_ids = []
+        with patch.object(type(Session), '_get_subscriber_domain',
+                          lambda session: [('id', 'in', self.partners.ids)]):
+            for _page in range(10):
+                changes = Session.get_subscriber_changes(sync_token, limit=limit)
+                partner_ids += [partner['id'] for partner in changes['partners']]
+                sync_token = changes['sync_token']
+                if changes['done']:
+                    return partner_ids, sync_token
+        self.fail("The synchronisation did not terminate")
+
+    def test_pages_sharing_write_date(self):
+        """More than ``limit`` partners with one write_date are paginated
+        without repeating a page"""
+        partner_ids, _sync_token = self._sync('2030-01-01 10:00:00|0', limit=3)
+        self.assertEqual(len(partner_ids), len(set(partner_ids)))
+        self.assertEqual(sorted(partner_ids), sorted(self.partners.ids))
+
+    def test_late_commit(self):
+        """A partner written by a transaction started before a
+        synchronisation and committed after it is returned by the next one"""
+        now = self.env.cr.now()
+        self.env.cr.execute("UPDATE res_partner SET write_date = %s WHERE id IN %s",
+                            [now - timedelta(hours=1), tuple(self.partners.ids)])
+        _partner_ids, sync_token = self._sync(False, limit=2000)
+
+        late_partner = self.partners[0]
+        self.env.cr.execute("UPDATE res_partner SET write_date = %s WHERE id = %s",
+                            [now - timedelta(minutes=5), late_partner.id])
+        partner_ids, _sync_token = self._sync(sync_token, limit=2000)
+        self.assertEqual(partner_ids, late_partner.ids)
@@ -0,0 +1,51 @@
+from odoo.tests import TransactionCase, tagged
+
+BASE_TEXT = 'Long product description. ' * 20
+
+
+@tagged('post_install', '-at_install')
+class TestTrackingCompaction(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.values = [BASE_TEXT + f'Revision {index}.' for index in range(4)]
+        cls.template = cls.env['product.template'].create({
+            'name': 'Tracked Product',
+            'description_sale': cls.values[0],
+        })
+        cls._flush_tracking()
+
+    @classmethod
+    def _flush_tracking(cls):
+        cls.env.flush_all()
+        cls.env.cr.precommit.run()
+
+    def _get_trackings(self):
+        field = self.env['ir.model.fields']._get('product.template', 'description_sale')
+        return self.env['mail.tracking.value'].search([
+            ('field_id', '=', field.id),
+            ('mail_message_id.model', '=', 'product.template'),
+            ('mail_message_id.res_id', '=', self.template.id),
+        ], order='id')
+
+    def test_values_anchored_on_stored_value(self):
+        """Compact values are rebuilt from the stored new value of the
+        latest change, whatever the current value of the record"""
+        for value in self.values[1:]:
+            self.template.description_sale = value
+            self._flush_tracking()
+
+        trackings = self._get_trackings()
+        self.assertEqual(len(trackings), 3)
+        self.assertTrue(all(tracking._is_compact() for tracking in trackings))
+        self.assertEqual([bool(tracking.new_value_text) for tracking in trackings], [False, False, True])
+
+        # A change made without tracking does not affect the history
+        self.env.cr.execute("UPDATE product_template SET description_sale = 'Imported' WHERE id = %s",
+                            [self.template.id])
+        self.template.invalidate_recordset(['description_sale'])
+        formatted = {values['id']: values for values in trackings._tracking_value_format()}
+        for index, tracking in enumerate(trackings):
+            self.assertEqual(formatted[tracking.id]['oldValue']['value'], self.values[index])
+            self.assertEqual(formatted[tracking.id]['newValue']['value'], self.values[index + 1])
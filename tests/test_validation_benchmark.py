@@ -0,0 +1,204 @@
+from odoo import Command
+from odoo.tests import TransactionCase, tagged
+from contextlib import contextmanager
+from itertools import count
+from unittest.mock import patch
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Query budgets of the scenarios on a transfer of 10 moves
+QUERY_BUDGETS = {
+    'check_available_quantity': 15,
+    'wizard_default_get': 25,
+    'validate_quantities': 20,
+    'button_validate': 450,
+    'product_write': 40,
+}
+
+# Scenarios whose query count grows with the moves: the stock validation
+# itself creates the move lines and updates the quants of each move
+SCALING_SCENARIOS = {'button_validate'}
+
+
+@contextmanager
+def _current_env(env, replica=True):
+    # The fixtures are not committed: read the previews in the test
+    # transaction, where their queries are counted
+    yield env
+
+
+class ValidationBenchmarkCase(TransactionCase):
+    """Measure the query counts of the validation hot paths on synthetic
+    stock; the module's part of each path must not grow with the number of
+    moves"""
+
+    @classmethod
+    def _generate_data(cls, quant_count, product_count):
+        """Create ``product_count`` products and ``quant_count`` quants
+        spread over sub-locations of a benchmark location
+
+        Quants are inserted in SQL and added to the availability ledger.
+        """
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        Location = cls.env['stock.location']
+        cls.location = Location.create({
+            'name': 'Benchmark',
+            'usage': 'internal',
+            'location_id': cls.warehouse.view_location_id.id,
+        })
+        locations = Location.create([
+            {'name': f'Benchmark {index}', 'usage': 'internal', 'location_id': cls.location.id}
+            for index in range(max(1, quant_count // product_count))
+        ])
+        cls.products = cls.env['product.product'].with_context(tracking_disable=True).create([
+            {'name': f'Benchmark Product {index}', 'type': 'product'}
+            for index in range(product_count)
+        ])
+        cls.env.flush_all()
+
+        cls.env.cr.execute("""
+            INSERT INTO stock_quant
+                (product_id, location_id, company_id, quantity, reserved_quantity, in_date,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT product_id, location_id, %(company_id)s, 10, 0, now() at time zone 'UTC',
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM unnest(%(product_ids)s::int[]) AS product_id
+             CROSS JOIN unnest(%(location_ids)s::int[]) AS location_id
+             LIMIT %(limit)s
+        """, {
+            'company_id': cls.env.company.id,
+            'uid': cls.env.uid,
+            'product_ids': cls.products.ids,
+            'location_ids': locations.ids,
+            'limit': quant_count,
+        })
+        cls.env.cr.execute("""
+            SELECT product_id, location_id, quantity FROM stock_quant WHERE location_id = ANY(%s)
+        """, [locations.ids])
+        cls.env['stock.availability.ledger']._apply_deltas({
+            (product_id, location_id): [quantity, 0.0]
+            for product_id, location_id, quantity in cls.env.cr.fetchall()
+        })
+        cls.env['stock.quant'].invalidate_model()
+
+    def _create_picking(self, move_count, picked=False):
+        customers = self.env.ref('stock.stock_location_customers')
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': self.warehouse.out_type_id.id,
+            'location_id': self.location.id,
+            'location_dest_id': customers.id,
+            'move_ids': [Command.create({
+                'name': product.display_name,
+                'product_id': product.id,
+                'product_uom': product.uom_id.id,
+                'product_uom_qty': 1.0,
+                'location_id': self.location.id,
+                'location_dest_id': customers.id,
+            }) for product in self.products[:move_count]],
+        })
+        picking.action_confirm()
+        if picked:
+            picking.action_assign()
+            picking.move_ids.picked = True
+        return picking
+
+    def _measure(self, function):
+        """Run ``function`` on cold record and availability caches, the
+        pending writes and tracking being flushed within the measure
+
+        :return: tuple (query count, wall time in ms)
+        """
+        # Fill the ormcaches (location subtrees, parameters) shared by all scales
+        function()
+        self.env.flush_all()
+        self.cr.precommit.run()
+        self.env.invalidate_all()
+        self.env['stock.move']._invalidate_availability_cache()
+        start_query_count = self.cr.sql_log_count
+        start = time.perf_counter()
+        function()
+        self.env.flush_all()
+        self.cr.precommit.run()
+        return self.cr.sql_log_count - start_query_count, (time.perf_counter() - start) * 1000
+
+    def _measure_scenarios(self, move_count):
+        """Measure every scenario on a transfer of ``move_count`` moves
+
+        :return: dict {scenario: (query count, wall time in ms)}
+        """
+        picking = self._create_picking(move_count)
+        moves = picking.move_ids
+        Wizard = self.env['inventory.transfer.wizard'].with_context(active_id=picking.id)
+        templates = moves.product_id.product_tmpl_id
+        revisions = count()
+        # One transfer for the warm-up run and one for the measure
+        picked_pickings = [self._create_picking(move_count, picked=True) for _index in range(2)]
+        with patch('odoo.addons.new_modules_customization.models.stock_move.snapshot_env', _current_env):
+            return {
+                'check_available_quantity': self._measure(moves._check_available_quantity),
+                'wizard_default_get': self._measure(lambda: Wizard.default_get(['picking_id', 'line_ids'])),
+                'validate_quantities': self._measure(lambda: (
+                    moves._lock_availability_keys(),
+                    picking._validate_transfer_quantities(),
+                )),
+                'button_validate': self._measure(lambda: picked_pickings.pop().with_context(
+                    skip_backorder=True, skip_sms=True,
+                ).button_validate()),
+                'product_write': self._measure(lambda: templates.write({
+                    'list_price': templates[:1].list_price + 1.0,
+                    'description_sale': 'Benchmark description\n' * 20 + f'Revision {next(revisions)}',
+                })),
+            }
+
+    def _assert_constant_queries(self, move_counts):
+        """Measure the scenarios at each number of moves, starting with 10,
+        check their query counts against ``QUERY_BUDGETS`` on the smallest
+        transfer and that, but for ``SCALING_SCENARIOS``, they do not depend
+        on the number of moves"""
+        measures = {move_count: self._measure_scenarios(move_count) for move_count in move_counts}
+        for move_count, scenarios in measures.items():
+            for scenario, (query_count, wall_time) in scenarios.items():
+                _logger.info("Benchmark %s with %s moves and %s quants: %s queries, %.1f ms",
+                             scenario, move_count, self.quant_count, query_count, wall_time)
+        smallest = measures[move_counts[0]]
+        for scenario, (query_count, _wall_time) in smallest.items():
+            self.assertLessEqual(query_count, QUERY_BUDGETS[scenario],
+                                 f"{scenario} exceeds its query budget with {move_counts[0]} moves")
+        for move_count in move_counts[1:]:
+            for scenario, (query_count, _wall_time) in measures[move_count].items():
+                if scenario in SCALING_SCENARIOS:
+                    continue
+                self.assertEqual(query_count, smallest[scenario][0],
+                                 f"{scenario} runs more queries with {move_count} moves "
+                                 f"than with {move_counts[0]}")
+
+
+@tagged('post_install', '-at_install')
+class TestValidationQueryCount(ValidationBenchmarkCase):
+
+    quant_count = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._generate_data(cls.quant_count, 100)
+
+    def test_query_count_independent_of_moves(self):
+        self._assert_constant_queries([10, 100])
+
+
+@tagged('post_install', '-at_install', '-standard', 'validation_benchmark')
+class TestValidationBenchmark(ValidationBenchmarkCase):
+    """Full grid, run on demand with ``--test-tags validation_benchmark``"""
+
+    quant_count = 100000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._generate_data(cls.quant_count, 1000)
+
+    def test_benchmark(self):
+        self._assert_constant_queries([10, 100, 1000])
@@ -0,0 +1,140 @@
+from odoo import api, Command, SUPERUSER_ID
+from odoo.exceptions import ValidationError
+from odoo.modules.registry import Registry
+from odoo.tests.common import BaseCase, get_db_name, tagged
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+@tagged('post_install', '-at_install')
+class TestValidationConcurrency(BaseCase):
+    """Concurrent validations of committed transfers, each request in its
+    own cursor as in separate workers"""
+
+    def setUp(self):
+        super().setUp()
+        self.registry = Registry(get_db_name())
+        self.product_ids, self.picking_ids = [], []
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            warehouse = env['stock.warehouse'].search([('company_id', '=', env.company.id)], limit=1)
+            self.out_type_id = warehouse.out_type_id.id
+            self.location_id = env['stock.location'].create({
+                'name': 'Concurrency Stock',
+                'usage': 'internal',
+                'location_id': warehouse.lot_stock_id.id,
+            }).id
+            self.user_id = env['res.users'].create({
+                'name': 'Concurrency Validator',
+                'login': 'concurrency_validator',
+                'groups_id': [Command.set([
+                    env.ref('stock.group_stock_manager').id,
+                    env.ref('new_modules_customization.group_inventory_transfer_manager').id,
+                ])],
+            }).id
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        with self.registry.cursor() as cr:
+            for table in ('stock_valuation_layer', 'stock_move_line', 'stock_move', 'stock_quant'):
+                cr.execute(f"DELETE FROM {table} WHERE product_id = ANY(%s)", [self.product_ids])
+            cr.execute("DELETE FROM stock_picking WHERE id = ANY(%s)", [self.picking_ids])
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env['product.product'].browse(self.product_ids).unlink()
+            env['stock.location'].browse(self.location_id).unlink()
+            env['res.users'].browse(self.user_id).unlink()
+
+    def _prepare_pickings(self, on_hand, quantities, on_hand_after_reservation=None):
+        """Commit a product with ``on_hand`` units and one reserved and
+        picked outgoing transfer per quantity
+
+        :param on_hand_after_reservation: on hand quantity set once the
+            transfers are reserved, to let them reserve more than what is
+            left
+        :return: ids of the transfers
+        """
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            location = env['stock.location'].browse(self.location_id)
+            customers = env.ref('stock.stock_location_customers')
+            product = env['product.product'].create({'name': 'Concurrency Product', 'type': 'product'})
+            self.product_ids.append(product.id)
+            env['stock.quant']._update_available_quantity(product, location, on_hand)
+            pickings = env['stock.picking'].create([{
+                'picking_type_id': self.out_type_id,
+                'location_id': location.id,
+                'location_dest_id': customers.id,
+                'move_ids': [Command.create({
+                    'name': product.display_name,
+                    'product_id': product.id,
+                    'product_uom': product.uom_id.id,
+                    'product_uom_qty': quantity,
+                    'location_id': location.id,
+                    'location_dest_id': customers.id,
+                })],
+            } for quantity in quantities])
+            self.picking_ids += pickings.ids
+            pickings.action_confirm()
+            pickings.action_assign()
+            pickings.move_ids.picked = True
+            if on_hand_after_reservation is not None:
+                env['stock.quant']._update_available_quantity(product, location, on_hand_after_reservation - on_hand)
+            return pickings.ids
+
+    def _validate_concurrently(self, picking_ids):
+        """Validate every transfer in its own thread and cursor, all of them
+        having read the transfer before any other validation starts
+
+        :return: list of 'done' or 'rejected' per transfer
+        """
+        barrier = threading.Barrier(len(picking_ids))
+
+        def validate(picking_id):
+            with self.registry.cursor() as cr:
+                env = api.Environment(cr, self.user_id, {})
+                picking = env['stock.picking'].browse(picking_id)
+                # The request has read data, so its own snapshot is taken
+                picking.move_ids.mapped('quantity')
+                barrier.wait()
+                try:
+                    # As the Validate button of the form
+                    picking.with_context(
+                        skip_backorder=True, skip_sms=True, validate_on_fresh_snapshot=True,
+                    ).button_validate()
+                except ValidationError:
+                    return 'rejected'
+                return 'done'
+
+        with ThreadPoolExecutor(max_workers=len(picking_ids)) as executor:
+            # Serialization failures are raised by result()
+            return list(executor.map(validate, picking_ids))
+
+    def _read_stock(self, picking_ids):
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            pickings = env['stock.picking'].browse(picking_ids)
+            quants = env['stock.quant'].search([
+                ('product_id', '=', self.product_ids[-1]),
+                ('location_id', '=', self.location_id),
+            ])
+            return pickings.mapped('state'), sum(quants.mapped('quantity'))
+
+    def test_no_oversell(self):
+        """Two transfers of 5 with 8 on hand: the second validation checks
+        the stock left by the first one"""
+        picking_ids = self._prepare_pickings(10.0, [5.0, 5.0], on_hand_after_reservation=8.0)
+        results = self._validate_concurrently(picking_ids)
+        self.assertEqual(sorted(results), ['done', 'rejected'])
+        states, on_hand = self._read_stock(picking_ids)
+        self.assertEqual(states.count('done'), 1)
+        self.assertEqual(on_hand, 3.0)
+
+    def test_concurrent_validations_succeed(self):
+        """Transfers of the same stock are validated one after the other
+        without serialization failures or retries"""
+        picking_ids = self._prepare_pickings(10.0, [2.0] * 4)
+        results = self._validate_concurrently(picking_ids)
+        self.assertEqual(results, ['done'] * 4)
+        states, on_hand = self._read_stock(picking_ids)
+        self.assertEqual(states, ['done'] * 4)
+        self.assertEqual(on_hand, 2.0)
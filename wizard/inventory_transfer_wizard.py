@@ -16,11 +16,10 @@ class InventoryTransferWizard(models.TransientModel):
             res['picking_id'] = picking.id
             
             lines = []
+            # Preview only, button_validate checks the quantities again
+            available_quantities = picking.move_ids._get_available_quantities(snapshot=True)
             for move in picking.move_ids:
-                available_qty = move._get_available_quantity_at_location(
-                    move.product_id,
-                    move.location_id
-                )
+                available_qty = available_quantities[move.id]
                 lines.append({
                     'product_id': move.product_id.id,
                     'requested_qty': move.product_uom_qty,